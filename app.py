@@ -1,16 +1,118 @@
 import os
-from flask import Flask, render_template, request, jsonify, Response, session
-from services.ai_service import generate_study_plan, generate_quiz, summarize_text, generate_feedback
-from services.nlp_service import generate_study_tips, extract_keywords, analyze_text_complexity
+import hmac
+import json
+import time
+import click
+from flask import (
+    Flask, render_template, request, jsonify, Response, session, url_for, stream_with_context, abort, g,
+    before_render_template, template_rendered
+)
+from services.ai_service import instant_study_plan, stream_study_plan, generate_quiz, summarize_text, generate_feedback
+from services.plan_engine import plan_refiner, normalize_hours
+from services.cache_service import get_cache_stats
+from services.single_flight import get_single_flight_stats
+from services.task_queue import get_task_queue_stats, get_refill_queue_stats, get_plan_queue_stats
+from services.llm_client import get_client_stats
+from services.metrics import (
+    registry, render_metrics, gauges, observe_stage, record_request, start_trace, end_trace, server_timing,
+    SERVER_TIMING
+)
+from services.artifact_store import artifact_store
+from services.feedback_pool import feedback_pool, performance_bucket
+from services.chart_service import get_subject_chart, stats_version
+from services.nlp_service import analyze_document
+from services.batch_service import analyze_documents, normalize_documents, BATCH_MAX_DOCUMENTS
 from services.data_service import (
     get_resources_for_subject, get_sample_content, save_user_session,
-    get_session_statistics, generate_subject_chart, create_schedule_csv
+    get_session_statistics, rebuild_session_statistics, query_session_analytics
+)
+from services.export_service import (
+    iter_schedule_csv, iter_schedule_ics, iter_plans_csv, iter_plans_ndjson, export_id
 )
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key")
 
 
+def service_gauges():
+    """Expose the counters the cache, upstream client and task queue already keep."""
+    yield from gauges('studypal_cache', get_cache_stats(), 'AI response cache')
+    yield from gauges('studypal_single_flight', get_single_flight_stats(), 'Request coalescing')
+    yield from gauges('studypal_llm_client', get_client_stats(), 'Upstream client')
+    yield from gauges('studypal_task_queue', get_task_queue_stats(), 'Background task queue')
+    yield from gauges('studypal_refill_queue', get_refill_queue_stats(), 'Pool refill queue')
+    yield from gauges('studypal_plan_queue', get_plan_queue_stats(), 'Plan refinement queue')
+
+
+registry.add_collector(service_gauges)
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if SERVER_TIMING == 'always' or (SERVER_TIMING == 'request' and request.headers.get('X-Server-Timing')):
+        start_trace()
+
+
+@app.after_request
+def record_request_timing(response):
+    """Record route latency; streamed bodies are timed up to their first byte."""
+    elapsed = time.perf_counter() - g.pop('request_started', time.perf_counter())
+    record_request(request.endpoint or 'unmatched', request.method, response.status_code, elapsed)
+    trace = end_trace()
+    if trace is not None:
+        response.headers['Server-Timing'] = server_timing(trace, elapsed)
+    return response
+
+
+@app.teardown_request
+def clear_request_trace(exc):
+    end_trace()
+
+
+@before_render_template.connect_via(app)
+def start_template_timer(sender, template, context, **extra):
+    g.template_started = time.perf_counter()
+
+
+@template_rendered.connect_via(app)
+def record_template_timing(sender, template, context, **extra):
+    started = g.pop('template_started', None)
+    if started is not None:
+        observe_stage('jinja', time.perf_counter() - started)
+
+
+def save_current(kind, value):
+    """Store a plan or quiz server-side and keep only its ID in the session cookie.
+
+    Every value gets a new ID: other workers may still hold the previous
+    value in memory, so an ID is never reused for different content.
+    """
+    session[f'{kind}_id'] = artifact_store.put(kind, value)
+
+
+def load_current(kind):
+    """Return the user's current plan or quiz, or an empty dict."""
+    return artifact_store.get(kind, session.get(f'{kind}_id')) or {}
+
+
+RECENT_PLANS = 10
+
+
+def remember_plan(plan_id):
+    """Add a plan to the session's recent plan IDs, which its open pages refer to."""
+    recent = [other for other in session.get('plan_ids', []) if other != plan_id]
+    session['plan_ids'] = [plan_id] + recent[:RECENT_PLANS - 1]
+
+
+def owned_plan_id():
+    """Return the ``plan_id`` request argument if it is one of this session's plans, else 404."""
+    plan_id = request.args.get('plan_id')
+    if not plan_id or plan_id not in session.get('plan_ids', []):
+        abort(404)
+    return plan_id
+
+
 @app.route('/')
 def index():
     """Home page with main navigation."""
@@ -20,14 +122,22 @@ def index():
 
 @app.route('/study-plan', methods=['GET', 'POST'])
 def study_plan():
-    """Generate a personalized study plan."""
+    """Generate a personalized study plan.
+
+    The local plan is shown at once. When the model is available, its plan
+    replaces the local one as it arrives: streamed day by day over SSE, or
+    fetched by polling once a background worker has it.
+    """
     if request.method == 'POST':
         subject = request.form.get('subject', 'General')
-        hours = int(request.form.get('hours', 2))
+        hours = normalize_hours(request.form.get('hours', 2))
         scenario = request.form.get('scenario', 'Exam Preparation')
         days = int(request.form.get('days', 7))
         
-        plan = generate_study_plan(subject, hours, scenario, days)
+        plan, refine = instant_study_plan(subject, hours, scenario, days)
+        # A new ID per plan, so a late refinement never overwrites a newer plan.
+        plan_id = artifact_store.put('plan', plan, pending=refine)
+        remember_plan(plan_id)
         
         resources = get_resources_for_subject(subject)
         
@@ -38,30 +148,124 @@ def study_plan():
             'feature_used': 'study_plan'
         })
         
-        session['current_plan'] = plan
+        stream_url = refine_url = None
+        if refine and request.form.get('stream'):
+            plan_refiner.expect_stream(plan_id, subject, hours, scenario, days)
+            stream_url = url_for('study_plan_stream', plan_id=plan_id, subject=subject, hours=hours,
+                                 scenario=scenario, days=days)
+        elif refine:
+            plan_refiner.submit(plan_id, subject, hours, scenario, days)
+            refine_url = url_for('study_plan_status', plan_id=plan_id)
         
-        return render_template('study_plan.html', plan=plan, resources=resources, subject=subject)
+        return render_template('study_plan.html', plan=plan, plan_id=plan_id, resources=resources,
+                               subject=subject, stream_url=stream_url, refine_url=refine_url)
     
     return render_template('study_plan_form.html')
 
 
+@app.route('/study-plan/status')
+def study_plan_status():
+    """Report whether a plan is still being refined, with the plan once it is final."""
+    plan_id = owned_plan_id()
+    if artifact_store.is_pending(plan_id):
+        return jsonify({'status': 'pending'})
+    return jsonify({'status': 'ready', 'plan': artifact_store.get('plan', plan_id) or {}})
+
+
+@app.route('/study-plan/stream')
+def study_plan_stream():
+    """Stream a study plan day by day as Server-Sent Events, storing it under the page's plan ID.
+
+    Once the plan is final, reconnects replay the stored plan instead of
+    asking the model again. A stream that closes before the plan is
+    complete keeps the local plan.
+    """
+    plan_id = owned_plan_id()
+    subject = request.args.get('subject', 'General')
+    hours = normalize_hours(request.args.get('hours', 2))
+    scenario = request.args.get('scenario', 'Exam Preparation')
+    days = request.args.get('days', 7, type=int)
+    
+    def events():
+        if not artifact_store.is_pending(plan_id):
+            plan = artifact_store.get('plan', plan_id) or {}
+            yield f"event: done\ndata: {json.dumps(plan)}\n\n"
+            return
+        plan_refiner.start_stream(plan_id, subject, hours, scenario, days)
+        try:
+            for event, data in stream_study_plan(subject, hours, scenario, days):
+                if event == 'plan':
+                    event = 'done'
+                    # Another stream for this page may have finished first.
+                    data = plan_refiner.store_streamed(plan_id, data)
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        finally:
+            plan_refiner.stream_closed(plan_id)
+    
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 @app.route('/download-schedule')
 def download_schedule():
-    """Download study schedule as CSV."""
-    plan = session.get('current_plan', {})
+    """Download the page's study schedule as CSV."""
+    plan = artifact_store.get('plan', owned_plan_id())
     
     if not plan:
         return "No study plan available. Please generate a plan first.", 400
     
-    csv_content = create_schedule_csv(plan)
-    
     return Response(
-        csv_content,
+        stream_with_context(iter_schedule_csv(plan)),
         mimetype='text/csv',
         headers={'Content-Disposition': 'attachment; filename=study_schedule.csv'}
     )
 
 
+@app.route('/download-schedule.ics')
+def download_schedule_ics():
+    """Download the page's study schedule as an iCalendar file."""
+    plan_id = owned_plan_id()
+    plan = artifact_store.get('plan', plan_id)
+    
+    if not plan:
+        return "No study plan available. Please generate a plan first.", 400
+    
+    return Response(
+        stream_with_context(iter_schedule_ics(plan, plan_id=export_id(plan_id))),
+        mimetype='text/calendar',
+        headers={'Content-Disposition': 'attachment; filename=study_schedule.ics'}
+    )
+
+
+@app.route('/admin/export/plans.<fmt>')
+def export_plans(fmt):
+    """Stream every stored study plan as CSV or NDJSON. Requires EXPORT_ADMIN_TOKEN."""
+    token = os.environ.get('EXPORT_ADMIN_TOKEN')
+    if not token:
+        abort(404)
+    
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    if not hmac.compare_digest(supplied.encode(), token.encode()):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    exporters = {
+        'csv': (iter_plans_csv, 'text/csv'),
+        'ndjson': (iter_plans_ndjson, 'application/x-ndjson')
+    }
+    if fmt not in exporters:
+        abort(404)
+    
+    exporter, mimetype = exporters[fmt]
+    return Response(
+        stream_with_context(exporter(artifact_store.iter_kind('plan'))),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=study_plans.{fmt}'}
+    )
+
+
 @app.route('/quiz', methods=['GET', 'POST'])
 def quiz():
     """Generate and take a quiz."""
@@ -79,7 +283,7 @@ def quiz():
             'feature_used': 'quiz'
         })
         
-        session['current_quiz'] = quiz_data
+        save_current('quiz', dict(quiz_data, subject=subject))
         
         return render_template('quiz.html', quiz=quiz_data, subject=subject)
     
@@ -89,7 +293,7 @@ def quiz():
 @app.route('/check-quiz', methods=['POST'])
 def check_quiz():
     """Check quiz answers and provide feedback."""
-    quiz_data = session.get('current_quiz', {})
+    quiz_data = load_current('quiz')
     answers = request.form.to_dict()
     
     if not quiz_data:
@@ -117,21 +321,19 @@ def check_quiz():
     total = len(quiz_data.get('questions', []))
     score = (correct_count / total * 100) if total > 0 else 0
     
-    if score >= 80:
-        performance = "excellent"
-    elif score >= 60:
-        performance = "good"
-    else:
-        performance = "needs improvement"
-    
-    feedback = generate_feedback(quiz_data.get('quiz_title', 'Quiz'), performance)
+    performance = performance_bucket(score)
+    subject = quiz_data.get('subject') or quiz_data.get('quiz_title', 'Quiz')
+    feedback, pooled = feedback_pool.get(subject, performance)
     
     return render_template('quiz_results.html', 
                          results=results, 
                          score=score, 
                          correct=correct_count, 
                          total=total,
-                         feedback=feedback)
+                         feedback=feedback,
+                         upgrade_feedback=not pooled,
+                         subject=subject,
+                         performance=performance)
 
 
 @app.route('/summarize', methods=['GET', 'POST'])
@@ -146,9 +348,9 @@ def summarize():
         
         summary = summarize_text(text)
         
-        tips = generate_study_tips(text, subject)
-        
-        complexity = analyze_text_complexity(text)
+        analysis = analyze_document(text)
+        tips = analysis.study_tips(subject)
+        complexity = analysis.complexity()
         
         save_user_session({
             'subject': subject,
@@ -171,7 +373,7 @@ def summarize():
 def resources():
     """Show study resources and statistics."""
     stats = get_session_statistics()
-    chart = generate_subject_chart()
+    chart_url = url_for('subject_chart', fmt='svg', v=stats_version(stats['subjects_studied']))
     
     subjects = ['Mathematics', 'Science', 'History', 'English', 'Computer Science']
     all_resources = {}
@@ -181,10 +383,28 @@ def resources():
     
     return render_template('resources.html', 
                          stats=stats, 
-                         chart=chart, 
+                         chart_url=chart_url, 
                          resources=all_resources)
 
 
+@app.route('/charts/subjects.<fmt>')
+def subject_chart(fmt):
+    """Serve the subject distribution chart as SVG or PNG."""
+    if fmt not in ('svg', 'png'):
+        return "Unsupported chart format.", 404
+    
+    stats = get_session_statistics()
+    body, mimetype, version = get_subject_chart(stats['subjects_studied'], fmt=fmt)
+    
+    response = Response(body, mimetype=mimetype)
+    response.set_etag(f"{fmt}-{version}")
+    if request.args.get('v') == version:
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+
 @app.route('/api/feedback', methods=['POST'])
 def get_feedback():
     """API endpoint for getting motivational feedback."""
@@ -196,6 +416,113 @@ def get_feedback():
     return jsonify(feedback)
 
 
+@app.route('/api/analyze/batch', methods=['POST'])
+def analyze_batch():
+    """Analyze many documents and stream the results back as NDJSON."""
+    data = request.get_json(silent=True) or {}
+    documents = data.get('documents')
+    
+    if not isinstance(documents, list) or not documents:
+        return jsonify({'error': 'Provide a non-empty "documents" list'}), 400
+    if len(documents) > BATCH_MAX_DOCUMENTS:
+        return jsonify({'error': f'At most {BATCH_MAX_DOCUMENTS} documents per request'}), 413
+    
+    try:
+        documents = normalize_documents(documents, data.get('subject', 'general'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    chunk_size = data.get('chunk_size')
+    if not isinstance(chunk_size, int) or chunk_size < 1:
+        chunk_size = None
+    
+    def lines():
+        for result in analyze_documents(documents, chunk_size):
+            yield json.dumps(result) + "\n"
+    
+    return Response(stream_with_context(lines()), mimetype='application/x-ndjson')
+
+
+@app.route('/api/cache-stats')
+def cache_stats():
+    """API endpoint exposing AI response cache hit/miss and request coalescing counters."""
+    stats = get_cache_stats()
+    stats["single_flight"] = get_single_flight_stats()
+    return jsonify(stats)
+
+
+@app.route('/api/task-stats')
+def task_stats():
+    """API endpoint exposing background, refill and plan queue depth and backpressure counters."""
+    stats = get_task_queue_stats()
+    stats["refill"] = get_refill_queue_stats()
+    stats["plan"] = get_plan_queue_stats()
+    return jsonify(stats)
+
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint. Requires METRICS_TOKEN as a bearer token when it is set."""
+    token = os.environ.get('METRICS_TOKEN')
+    if token:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if not hmac.compare_digest(supplied.encode(), token.encode()):
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/api/analytics/sessions')
+def session_analytics():
+    """API endpoint counting sessions over a time range, grouped by subject, feature, day or hour."""
+    try:
+        result = query_session_analytics(
+            start=request.args.get('start'),
+            end=request.args.get('end'),
+            group_by=request.args.get('group_by', 'subject'),
+            subject=request.args.get('subject'),
+            feature=request.args.get('feature')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(result)
+
+
+@app.cli.command('rebuild-stats')
+def rebuild_stats_command():
+    """Recompute session statistics from the raw sessions log."""
+    stats = rebuild_session_statistics()
+    print(f"Rebuilt statistics from {stats['total_sessions']} sessions.")
+
+
+@app.cli.command('migrate-sessions')
+def migrate_sessions_command():
+    """Import the sessions CSV log into the indexed session store (runs once)."""
+    from services.session_store import session_store
+    
+    session_store.migrate()
+    print(f"Session store has {session_store.query(group_by='feature')['total']} sessions.")
+
+
+@app.cli.command('build-keyword-index')
+def build_keyword_index_command():
+    """Rebuild the TF-IDF keyword index from the content catalog and corpus."""
+    from services.keyword_engine import build_keyword_index
+    
+    engine = build_keyword_index()
+    print(f"Indexed {len(engine.terms)} terms from {engine.n_documents} documents.")
+
+
+@app.cli.command('refill-question-bank')
+@click.option('--subject', required=True)
+@click.option('--difficulty', default='medium', show_default=True)
+def refill_question_bank_command(subject, difficulty):
+    """Fill a quiz question bank bucket up to its high watermark."""
+    from services.question_bank import refill, question_bank
+
+    added = refill(subject, difficulty)
+    print(f"Added {added} questions; {question_bank.count(subject, difficulty)} banked for {subject} ({difficulty}).")
+
+
 if __name__ == "__main__":
     app.run(
         debug=True,
@@ -0,0 +1,238 @@
+"""Local stand-in for the OpenAI chat-completions API.
+
+Serves canned JSON for each kind of prompt the app sends (study plan,
+quiz, summary, feedback) with configurable latency, jitter and error
+rate, so the app can be load tested without spending tokens:
+
+    python benchmarks/fake_openai.py --port 8808 --latency-ms 800 --jitter-ms 200 --error-rate 0.05
+    OPENAI_API_KEY=fake OPENAI_BASE_URL=http://127.0.0.1:8808/v1 python app.py
+
+Streaming requests (``"stream": true``) are answered as Server-Sent
+Events, split into small chunks like the real API. Pass ``--responses
+FILE`` with a JSON object keyed by kind to override the canned bodies.
+"""
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+def study_plan_body(prompt):
+    days = int((re.search(r"(\d+)-day", prompt) or [0, 7])[1])
+    return {
+        "plan_title": "Study Plan",
+        "total_days": days,
+        "hours_per_day": 2,
+        "daily_schedule": [
+            {
+                "day": day,
+                "focus_topic": f"Topic {day}",
+                "activities": [
+                    {"time": "9:00 AM - 10:00 AM", "activity": f"Read chapter {day}"},
+                    {"time": "10:00 AM - 10:15 AM", "activity": "Short break"},
+                    {"time": "10:15 AM - 11:15 AM", "activity": f"Practice problems for chapter {day}"}
+                ],
+                "goals": [f"Finish chapter {day}", "Summarize key ideas"]
+            }
+            for day in range(1, days + 1)
+        ],
+        "weekly_goals": ["Cover every chapter", "Complete the practice sets", "Review weak areas"]
+    }
+
+
+def quiz_body(prompt):
+    count = int((re.search(r"with (\d+) multiple-choice", prompt) or [0, 5])[1])
+    return {
+        "quiz_title": "Quiz",
+        "difficulty": "medium",
+        "questions": [
+            {
+                "id": i + 1,
+                "question": f"Benchmark question {i + 1} ({random.getrandbits(32):08x})?",
+                "options": ["A) First", "B) Second", "C) Third", "D) Fourth"],
+                "correct_answer": "ABCD"[i % 4],
+                "explanation": "Canned explanation."
+            }
+            for i in range(count)
+        ]
+    }
+
+
+def summary_body(prompt):
+    return {
+        "summary": "A canned summary of the submitted text.",
+        "key_points": ["First key point", "Second key point", "Third key point"],
+        "word_count": 8
+    }
+
+
+def feedback_body(prompt):
+    return {"message": "Great work, keep going!", "tip": "Review your notes tomorrow.", "emoji": "star"}
+
+
+BODIES = {
+    "study_plan": study_plan_body,
+    "quiz": quiz_body,
+    "summary": summary_body,
+    "feedback": feedback_body,
+}
+
+
+def classify(messages):
+    """Tell which app feature a chat request came from."""
+    system = " ".join(m.get("content", "") for m in messages if m.get("role") == "system").lower()
+    if "study planning" in system:
+        return "study_plan"
+    if "quiz" in system:
+        return "quiz"
+    if "coach" in system:
+        return "feedback"
+    return "summary"
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        try:
+            self._respond()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up (a deadline expired, or the app shut down mid-request).
+            self.close_connection = True
+
+    def _respond(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        config = self.config
+        config.count(request)
+
+        delay = max(0.0, random.gauss(config.latency, config.jitter)) if config.jitter else config.latency
+        time.sleep(delay)
+
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+            return
+        if random.random() < config.error_rate:
+            status = random.choice([429, 500, 503])
+            self._send_json(status, {"error": {"message": "Injected failure", "type": "server_error"}})
+            return
+
+        messages = request.get("messages", [])
+        kind = classify(messages)
+        prompt = messages[-1].get("content", "") if messages else ""
+        canned = config.responses.get(kind)
+        content = json.dumps(canned if canned is not None else BODIES[kind](prompt))
+
+        if request.get("stream"):
+            self._stream(request, content)
+        else:
+            self._send_json(200, {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "gpt-4o-mini"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop"
+                }],
+                "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                          "total_tokens": (len(prompt) + len(content)) // 4}
+            })
+
+    def _stream(self, request, content):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send(data):
+            payload = f"data: {data}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(payload):x}\r\n".encode() + payload + b"\r\n")
+
+        base = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": request.get("model", "gpt-4o-mini")}
+        chunk_size = self.config.stream_chunk_chars
+        for start in range(0, len(content), chunk_size):
+            delta = {"content": content[start:start + chunk_size]}
+            send(json.dumps(dict(base, choices=[{"index": 0, "delta": delta, "finish_reason": None}])))
+            if self.config.stream_interval:
+                time.sleep(self.config.stream_interval)
+        send(json.dumps(dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])))
+        send("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class FakeConfig:
+    """Behaviour of the fake server, shared by all handler threads."""
+
+    def __init__(self, latency_ms=500, jitter_ms=0, error_rate=0.0, responses=None,
+                 stream_chunk_chars=40, stream_interval_ms=5):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.responses = responses or {}
+        self.stream_chunk_chars = stream_chunk_chars
+        self.stream_interval = stream_interval_ms / 1000
+        self.requests = {}
+        self._lock = threading.Lock()
+
+    def count(self, request):
+        kind = classify(request.get("messages", []))
+        with self._lock:
+            self.requests[kind] = self.requests.get(kind, 0) + 1
+
+
+def start_server(host="127.0.0.1", port=0, **config):
+    """Start the fake API on a background thread. Returns ``(server, base_url)``."""
+    handler = type("Handler", (FakeOpenAIHandler,), {"config": FakeConfig(**config)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-openai", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8808)
+    parser.add_argument("--latency-ms", type=float, default=500, help="mean response latency")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="standard deviation of the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 429/5xx")
+    parser.add_argument("--responses", help="JSON file of canned bodies keyed by study_plan/quiz/summary/feedback")
+    args = parser.parse_args(argv)
+
+    responses = None
+    if args.responses:
+        with open(args.responses) as f:
+            responses = json.load(f)
+
+    server, base_url = start_server(args.host, args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                                    error_rate=args.error_rate, responses=responses)
+    print(f"Fake OpenAI API listening on {base_url}", file=sys.stderr)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""Cold-start benchmark for app.py and the services package.
+
+Each measurement runs in a fresh interpreter against a throwaway copy of
+the app, so real session data is never touched and nothing is warm:
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --runs 10 --max-cold-start-ms 500
+    python benchmarks/import_time.py --baseline benchmarks/import_time_baseline.json --update-baseline
+
+The script exits with status 1 if the median cold start exceeds
+``--max-cold-start-ms`` or regresses past ``--tolerance`` times the
+recorded baseline.
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+ROUTES = [
+    ('GET', '/', None),
+    ('GET', '/resources', None),
+    ('GET', '/charts/subjects.svg', None),
+    ('GET', '/study-plan', None),
+    ('POST', '/study-plan', {'subject': 'Mathematics', 'hours': '2', 'scenario': 'Exam Preparation', 'days': '7'}),
+    ('POST', '/quiz', {'subject': 'Science', 'difficulty': 'medium', 'num_questions': '5'}),
+    ('POST', '/summarize', {'subject': 'Science', 'text': 'Photosynthesis converts light energy into chemical energy. '
+                                                         'Plants use chlorophyll to capture sunlight.'}),
+]
+
+IMPORT_SNIPPET = """
+import time, json
+start = time.perf_counter()
+import app
+print(json.dumps({"import_ms": (time.perf_counter() - start) * 1000}))
+"""
+
+REQUEST_SNIPPET = """
+import time, json, sys
+method, path, form = json.loads(sys.argv[1])
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+response = client.open(path, method=method, data=form)
+done = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "first_request_ms": (done - imported) * 1000,
+    "status": response.status_code,
+}))
+"""
+
+
+def make_sandbox():
+    """Copy the app into a temporary directory so benchmarks never write real data."""
+    sandbox = tempfile.mkdtemp(prefix='study-pal-bench-')
+    shutil.copy(os.path.join(ROOT, 'app.py'), sandbox)
+    for name in ('services', 'templates'):
+        shutil.copytree(os.path.join(ROOT, name), os.path.join(sandbox, name),
+                        ignore=shutil.ignore_patterns('__pycache__'))
+    os.makedirs(os.path.join(sandbox, 'data'))
+    shutil.copy(os.path.join(ROOT, 'data', 'educational_content.json'), os.path.join(sandbox, 'data'))
+    nltk_data = os.path.join(ROOT, 'nltk_data')
+    if os.path.isdir(nltk_data):
+        os.symlink(nltk_data, os.path.join(sandbox, 'nltk_data'))
+    return sandbox
+
+
+def run_python(sandbox, snippet, *args):
+    env = dict(os.environ)
+    env.pop('OPENAI_API_KEY', None)
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+    result = subprocess.run(
+        [sys.executable, '-c', snippet, *args],
+        cwd=sandbox, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure(runs):
+    sandbox = make_sandbox()
+    try:
+        cold_starts = [run_python(sandbox, IMPORT_SNIPPET)['import_ms'] for _ in range(runs)]
+
+        routes = {}
+        for method, path, form in ROUTES:
+            samples = [run_python(sandbox, REQUEST_SNIPPET, json.dumps([method, path, form]))
+                       for _ in range(runs)]
+            routes[f'{method} {path}'] = {
+                'status': samples[-1]['status'],
+                'first_request_ms_median': round(statistics.median(s['first_request_ms'] for s in samples), 2),
+                'first_request_ms_max': round(max(s['first_request_ms'] for s in samples), 2),
+            }
+    finally:
+        shutil.rmtree(sandbox, ignore_errors=True)
+
+    return {
+        'runs': runs,
+        'python': sys.version.split()[0],
+        'cold_start_ms_median': round(statistics.median(cold_starts), 2),
+        'cold_start_ms_max': round(max(cold_starts), 2),
+        'routes': routes,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters per measurement')
+    parser.add_argument('--max-cold-start-ms', type=float, default=1000,
+                        help='fail if the median cold start exceeds this budget')
+    parser.add_argument('--baseline', help='JSON results of a previous run to compare against')
+    parser.add_argument('--tolerance', type=float, default=1.25,
+                        help='allowed slowdown factor relative to the baseline')
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='write this run to --baseline instead of comparing')
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    args = parser.parse_args(argv)
+
+    results = measure(args.runs)
+    print(json.dumps(results, indent=2))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    failures = []
+    cold_start = results['cold_start_ms_median']
+    if cold_start > args.max_cold_start_ms:
+        failures.append(f'cold start {cold_start:.0f} ms exceeds budget of {args.max_cold_start_ms:.0f} ms')
+
+    if args.baseline and args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+    elif args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        limit = baseline['cold_start_ms_median'] * args.tolerance
+        if cold_start > limit:
+            failures.append(f'cold start {cold_start:.0f} ms regressed past {limit:.0f} ms '
+                            f'({args.tolerance}x baseline)')
+
+    for failure in failures:
+        print(f'FAIL: {failure}', file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
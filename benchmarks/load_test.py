@@ -0,0 +1,237 @@
+"""Load test every app route against the local fake OpenAI API.
+
+Starts the fake API and the app (in a throwaway copy, so real data is
+never touched) and drives each route at a fixed concurrency, reporting
+throughput and p50/p95/p99 latency per route:
+
+    python benchmarks/load_test.py --concurrency 20 --requests 200 --latency-ms 800 --output results.json
+    python benchmarks/load_test.py --routes quiz check_quiz --unique --error-rate 0.1
+
+By default requests repeat the same parameters, so after the first call
+most are served from the response cache. Use ``--unique`` to give every
+request its own subject and measure the upstream path instead.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import shutil
+import argparse
+import itertools
+import subprocess
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+import http.cookiejar
+from concurrent.futures import ThreadPoolExecutor
+
+from fake_openai import start_server
+from import_time import make_sandbox
+
+SUMMARY_TEXT = ("Photosynthesis converts light energy into chemical energy. Plants use chlorophyll "
+                "to capture sunlight and turn carbon dioxide and water into glucose and oxygen. ") * 20
+
+SERVER_SNIPPET = """
+import sys
+from werkzeug.serving import run_simple
+import app
+run_simple('127.0.0.1', int(sys.argv[1]), app.app, threaded=True)
+"""
+
+
+def _subject(base, unique, counter):
+    return f"{base} {next(counter)}" if unique else base
+
+
+def _form(fields):
+    return urllib.parse.urlencode(fields).encode()
+
+
+def route_study_plan(user, unique, counter):
+    return user.open('/study-plan', _form({
+        'subject': _subject('Mathematics', unique, counter), 'hours': 2,
+        'scenario': 'Exam Preparation', 'days': 7
+    }))
+
+
+def route_quiz(user, unique, counter):
+    return user.open('/quiz', _form({
+        'subject': _subject('Science', unique, counter), 'difficulty': 'medium', 'num_questions': 5
+    }))
+
+
+def route_check_quiz(user, unique, counter):
+    return user.open('/check-quiz', _form({f'q_{i}': 'ABCD'[i % 4] for i in range(1, 6)}))
+
+
+def route_summarize(user, unique, counter):
+    text = f"{SUMMARY_TEXT} Request {next(counter)}." if unique else SUMMARY_TEXT
+    return user.open('/summarize', _form({'subject': 'Biology', 'text': text}))
+
+
+def route_resources(user, unique, counter):
+    return user.open('/resources')
+
+
+def route_feedback(user, unique, counter):
+    body = json.dumps({'subject': _subject('History', unique, counter), 'performance': 'good'}).encode()
+    return user.open('/api/feedback', body, {'Content-Type': 'application/json'})
+
+
+ROUTES = {
+    'study_plan': ('POST /study-plan', route_study_plan),
+    'quiz': ('POST /quiz', route_quiz),
+    'check_quiz': ('POST /check-quiz', route_check_quiz),
+    'summarize': ('POST /summarize', route_summarize),
+    'resources': ('GET /resources', route_resources),
+    'feedback': ('POST /api/feedback', route_feedback),
+}
+
+
+class VirtualUser:
+    """A browser-like client with its own cookie jar."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def open(self, path, data=None, headers=None):
+        request = urllib.request.Request(self.base_url + path, data=data, headers=headers or {})
+        try:
+            with self.opener.open(request, timeout=120) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, min(len(sorted_values), round(p / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[rank - 1]
+
+
+def summarize_samples(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    count = len(latencies)
+    return {
+        'requests': count,
+        'errors': errors,
+        'throughput_rps': round(count / elapsed, 2) if elapsed else 0,
+        'mean_ms': round(sum(latencies) / count, 2) if count else 0,
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'max_ms': round(latencies[-1], 2) if count else 0,
+    }
+
+
+def run_route(base_url, route, concurrency, total, unique):
+    label, func = ROUTES[route]
+    counter = itertools.count()
+    users = [VirtualUser(base_url) for _ in range(concurrency)]
+    if route == 'check_quiz':
+        for user in users:
+            route_quiz(user, unique, counter)
+
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    remaining = itertools.count()
+
+    def worker(user):
+        nonlocal errors
+        while next(remaining) < total:
+            start = time.perf_counter()
+            status = func(user, unique, counter)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed_ms)
+                if status >= 400:
+                    errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(worker, users))
+    elapsed = time.perf_counter() - start
+    return label, summarize_samples(latencies, errors, elapsed)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait_for(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=2).read()
+            return
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.1)
+    raise RuntimeError(f'app did not start at {url}')
+
+
+def run(args):
+    fake, fake_url = start_server(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate)
+    sandbox = make_sandbox()
+    port = _free_port()
+    env = dict(os.environ, OPENAI_API_KEY='fake', OPENAI_BASE_URL=fake_url, PYTHONDONTWRITEBYTECODE='1')
+    server = subprocess.Popen([sys.executable, '-c', SERVER_SNIPPET, str(port)], cwd=sandbox, env=env,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        _wait_for(base_url + '/')
+        routes = {}
+        for route in args.routes:
+            label, result = run_route(base_url, route, args.concurrency, args.requests, args.unique)
+            routes[label] = result
+            print(f"{label:22} {result['throughput_rps']:8.1f} req/s  p50 {result['p50_ms']:8.1f} ms  "
+                  f"p95 {result['p95_ms']:8.1f} ms  p99 {result['p99_ms']:8.1f} ms  errors {result['errors']}",
+                  file=sys.stderr)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+        fake.shutdown()
+        shutil.rmtree(sandbox, ignore_errors=True)
+
+    return {
+        'benchmark': 'load_test',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'config': {
+            'concurrency': args.concurrency, 'requests_per_route': args.requests, 'unique': args.unique,
+            'latency_ms': args.latency_ms, 'jitter_ms': args.jitter_ms, 'error_rate': args.error_rate,
+        },
+        'upstream_requests': dict(fake.RequestHandlerClass.config.requests),
+        'routes': routes,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', type=int, default=10, help='simultaneous virtual users')
+    parser.add_argument('--requests', type=int, default=100, help='requests per route')
+    parser.add_argument('--routes', nargs='+', choices=list(ROUTES), default=list(ROUTES))
+    parser.add_argument('--unique', action='store_true', help='vary parameters so responses are not cached')
+    parser.add_argument('--latency-ms', type=float, default=500, help='fake upstream mean latency')
+    parser.add_argument('--jitter-ms', type=float, default=100, help='fake upstream latency standard deviation')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of upstream calls that fail')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""Microbenchmarks for the text analysis, session logging and chart hot paths.
+
+Each benchmark runs at growing input sizes in a throwaway copy of the
+app, so real session data is never touched:
+
+    python benchmarks/microbench.py
+    python benchmarks/microbench.py --repeat 7 --output microbench.json
+    python benchmarks/microbench.py --only extract_keywords save_user_session
+
+Reported times are the median and best of ``--repeat`` runs.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import statistics
+import subprocess
+
+from import_time import make_sandbox
+
+WORDS = ("photosynthesis chlorophyll energy glucose oxygen carbon dioxide plant cell membrane nucleus "
+         "mitochondria enzyme protein molecule reaction equation derivative integral function limit "
+         "theorem proof vector matrix history revolution empire treaty economy trade language grammar").split()
+
+SIZES = {
+    'extract_keywords': [100, 1000, 10000, 100000],
+    'analyze_text_complexity': [100, 1000, 10000, 100000],
+    'save_user_session': [100, 1000, 10000],
+    'generate_subject_chart': [5, 50, 500],
+}
+
+
+def make_text(words, seed=0):
+    """Build a pseudo-document of ``words`` words split into sentences."""
+    rng = random.Random(seed)
+    sentences = []
+    while words > 0:
+        length = min(words, rng.randint(8, 20))
+        sentence = " ".join(rng.choice(WORDS) for _ in range(length))
+        sentences.append(sentence.capitalize() + ".")
+        words -= length
+    return " ".join(sentences)
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {'median_ms': round(statistics.median(samples), 3), 'best_ms': round(min(samples), 3)}
+
+
+def bench_extract_keywords(size, repeat):
+    from services.nlp_service import extract_keywords
+
+    text = make_text(size)
+    extract_keywords(text)
+    return timed(lambda: extract_keywords(text), repeat)
+
+
+def bench_analyze_text_complexity(size, repeat):
+    from services.nlp_service import analyze_text_complexity
+
+    text = make_text(size)
+    analyze_text_complexity(text)
+    return timed(lambda: analyze_text_complexity(text), repeat)
+
+
+def bench_save_user_session(size, repeat):
+    """Time recording ``size`` sessions, including draining them to disk."""
+    from services.data_service import save_user_session
+    from services.session_log import session_writer
+    from services.task_queue import background_tasks
+
+    subjects = ['Mathematics', 'Science', 'History', 'English', 'Computer Science']
+
+    def record():
+        for i in range(size):
+            save_user_session({
+                'subject': subjects[i % len(subjects)], 'hours_per_day': i % 5,
+                'scenario': 'benchmark', 'feature_used': 'quiz'
+            })
+        background_tasks.join()
+        session_writer.flush()
+
+    result = timed(record, repeat)
+    result['per_record_us'] = round(result['median_ms'] * 1000 / size, 3)
+    return result
+
+
+def bench_generate_subject_chart(size, repeat):
+    """Render the subject chart for ``size`` distinct subjects, bypassing the chart cache."""
+    from services.chart_service import RENDERERS
+
+    rng = random.Random(size)
+    subjects = {f'Subject {i}': rng.randint(1, 500) for i in range(size)}
+    results = {}
+    for fmt, (mimetype, render) in RENDERERS.items():
+        render(subjects)
+        results[fmt] = timed(lambda: render(subjects), repeat)
+    return results
+
+
+BENCHMARKS = {
+    'extract_keywords': bench_extract_keywords,
+    'analyze_text_complexity': bench_analyze_text_complexity,
+    'save_user_session': bench_save_user_session,
+    'generate_subject_chart': bench_generate_subject_chart,
+}
+
+
+def worker(names, repeat):
+    """Run benchmarks in this process (called inside the sandbox)."""
+    results = {}
+    for name in names:
+        results[name] = {}
+        for size in SIZES[name]:
+            results[name][str(size)] = BENCHMARKS[name](size, repeat)
+            print(f'{name:26} size {size:>7}  {json.dumps(results[name][str(size)])}', file=sys.stderr)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5, help='runs per measurement')
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(worker(args.only, args.repeat)))
+        return 0
+
+    sandbox = make_sandbox()
+    try:
+        env = dict(os.environ, PYTHONPATH=sandbox, PYTHONDONTWRITEBYTECODE='1')
+        env.pop('OPENAI_API_KEY', None)
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--worker', '--repeat', str(args.repeat),
+             '--only', *args.only],
+            cwd=sandbox, env=env, stdout=subprocess.PIPE, text=True, check=True
+        )
+    finally:
+        shutil.rmtree(sandbox, ignore_errors=True)
+
+    results = {
+        'benchmark': 'microbench',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'repeat': args.repeat,
+        'results': json.loads(completed.stdout.strip().splitlines()[-1]),
+    }
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
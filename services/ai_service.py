@@ -1,16 +1,45 @@
 import os
-import json
 import random
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor
+from services.cache_service import response_cache, make_key, normalize_subject, normalize_text
+from services.json_parsing import IncrementalArrayParser
+from services.llm_client import chat_completion, is_available, UpstreamUnavailable
+from services.metrics import stage, record_usage, record_fallback, record_continuation
+from services.nlp_service import chunk_text, estimate_tokens
+from services.extractive_summary import compress_text, extractive_summary
+from services.plan_engine import build_study_plan
+from services.output_schemas import (
+    response_format, clean_day, parse_days, parse_study_plan, parse_questions, parse_summary, parse_feedback
+)
+from services.question_bank import question_bank, request_refill, assemble_quiz, question_hash
+from services.single_flight import single_flight
+from services.task_queue import background_tasks
 
-api_key = os.environ.get("OPENAI_API_KEY")
-client = None
-if api_key:
-    client = OpenAI(api_key=api_key)
 
-def generate_study_plan(subject, hours_per_day, scenario, days=7):
-    """Generate a personalized study plan using AI."""
-    prompt = f"""Create a detailed {days}-day study plan for a student studying {subject}.
+def _coalesced(cache_key, request, cacheable=None):
+    """Run an upstream request once for all concurrent identical calls and cache its result.
+
+    Results for which ``cacheable`` returns False are shared with the
+    waiting callers but not cached.
+    """
+    def run():
+        result = request()
+        if cacheable is None or cacheable(result):
+            response_cache.set(cache_key, result)
+        return result
+
+    return single_flight.do(cache_key, run, lookup=lambda: response_cache.get(cache_key))
+
+
+def _parsed(parse, content, *args):
+    """Run one of the ``output_schemas`` parsers, timed as the json_parse stage."""
+    with stage("json_parse"):
+        return parse(content, *args)
+
+
+def _study_plan_prompt(subject, hours_per_day, scenario, days):
+    """Build the study plan prompt."""
+    return f"""Create a detailed {days}-day study plan for a student studying {subject}.
     
 Requirements:
 - Study hours per day: {hours_per_day}
@@ -41,40 +70,264 @@ Format the response as JSON with this structure:
 
 Only respond with valid JSON, no additional text."""
 
-    if not client:
+
+def _study_plan_cache_key(subject, hours_per_day, scenario, days):
+    """Build the response cache key for a study plan request."""
+    return make_key(
+        "study_plan",
+        subject=normalize_subject(subject),
+        hours_per_day=hours_per_day,
+        scenario=normalize_text(scenario),
+        days=days,
+    )
+
+
+def _study_plan_messages(subject, hours_per_day, scenario, days):
+    """Build the chat messages for a study plan request."""
+    return [
+        {"role": "system", "content": "You are a helpful study planning assistant. Always respond with valid JSON only."},
+        {"role": "user", "content": _study_plan_prompt(subject, hours_per_day, scenario, days)}
+    ]
+
+
+def _continuation_prompt(subject, hours_per_day, scenario, days, done):
+    """Build the prompt that asks only for the days a cut-off plan is missing."""
+    covered = "\n".join(f"Day {day['day']}: {day['focus_topic']}" for day in done)
+    first = len(done) + 1
+    return f"""Continue a {days}-day study plan for a student studying {subject}.
+
+Requirements:
+- Study hours per day: {hours_per_day}
+- Scenario: {scenario}
+
+Days already planned:
+{covered}
+
+Write only days {first} to {days}, picking up where the plan stops.
+
+Format the response as JSON with this structure:
+{{
+    "daily_schedule": [
+        {{
+            "day": {first},
+            "focus_topic": "Topic name",
+            "activities": [
+                {{"time": "9:00 AM - 10:00 AM", "activity": "Activity description"}},
+                {{"time": "10:00 AM - 10:15 AM", "activity": "Short break"}}
+            ],
+            "goals": ["Goal 1", "Goal 2"]
+        }}
+    ]
+}}
+
+Only respond with valid JSON, no additional text."""
+
+
+def _request_missing_days(subject, hours_per_day, scenario, days, done):
+    """Ask the model for the days after ``done`` and return the valid ones, numbered on from it."""
+    record_continuation("study_plan")
+    response = chat_completion(
+        "study_plan",
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": "You are a helpful study planning assistant. Always respond with valid JSON only."},
+            {"role": "user", "content": _continuation_prompt(subject, hours_per_day, scenario, days, done)}
+        ],
+        temperature=0.7,
+        max_tokens=2000,
+        **response_format("study_plan_days")
+    )
+
+    data, missing = _parsed(parse_days, response.choices[0].message.content)
+    missing = missing[:days - len(done)]
+    for number, day in enumerate(missing, start=len(done) + 1):
+        day["day"] = number
+    return missing
+
+
+def _request_study_plan(subject, hours_per_day, scenario, days):
+    """Ask the model for a study plan, keeping every valid day of a cut-off reply.
+
+    If the reply stops short, the missing days are requested once; the
+    plan can still come back short. Raises ValueError if no day is usable.
+    """
+    response = chat_completion(
+        "study_plan",
+        model="gpt-4o-mini",
+        messages=_study_plan_messages(subject, hours_per_day, scenario, days),
+        temperature=0.7,
+        max_tokens=2000,
+        **response_format("study_plan")
+    )
+
+    plan = _parsed(parse_study_plan, response.choices[0].message.content, subject, hours_per_day, days)
+    schedule = plan["daily_schedule"]
+    if not schedule:
+        raise ValueError("Study plan reply has no usable days")
+    if len(schedule) < days:
+        try:
+            schedule.extend(_request_missing_days(subject, hours_per_day, scenario, days, schedule))
+        except Exception as e:
+            pass
+    return plan
+
+
+def _plan_complete(days):
+    return lambda plan: len(plan["daily_schedule"]) >= days
+
+
+def _top_up_study_plan(plan, subject, hours_per_day, scenario, days):
+    """Fill the days and goals the model did not deliver from the local plan."""
+    if len(plan["daily_schedule"]) >= days and plan["weekly_goals"]:
+        return plan
+    record_fallback("study_plan", "partial")
+    local = create_fallback_study_plan(subject, hours_per_day, scenario, days)
+    schedule = plan["daily_schedule"][:days]
+    return dict(
+        plan,
+        daily_schedule=schedule + local["daily_schedule"][len(schedule):],
+        weekly_goals=plan["weekly_goals"] or local["weekly_goals"]
+    )
+
+
+def cached_study_plan(subject, hours_per_day, scenario, days=7):
+    """Return the model's plan if it is already cached, else None."""
+    return response_cache.get(_study_plan_cache_key(subject, hours_per_day, scenario, days))
+
+
+def request_study_plan(subject, hours_per_day, scenario, days=7):
+    """Return the model's plan, from the cache when possible. Raises if the model cannot be reached."""
+    cache_key = _study_plan_cache_key(subject, hours_per_day, scenario, days)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    if not is_available():
+        raise UpstreamUnavailable("OpenAI is not available")
+    plan = _coalesced(cache_key, lambda: _request_study_plan(subject, hours_per_day, scenario, days),
+                      cacheable=_plan_complete(days))
+    return _top_up_study_plan(plan, subject, hours_per_day, scenario, days)
+
+
+def instant_study_plan(subject, hours_per_day, scenario, days=7):
+    """Return ``(plan, refine)`` without waiting on the model.
+
+    The plan is the model's cached plan when there is one, otherwise the
+    local plan; ``refine`` tells whether the model should be asked for a
+    plan to replace it.
+    """
+    cached = cached_study_plan(subject, hours_per_day, scenario, days)
+    if cached is not None:
+        return cached, False
+    if not is_available():
+        record_fallback("study_plan", "unavailable")
+        return create_fallback_study_plan(subject, hours_per_day, scenario, days), False
+    return create_fallback_study_plan(subject, hours_per_day, scenario, days), True
+
+
+def generate_study_plan(subject, hours_per_day, scenario, days=7):
+    """Generate a personalized study plan using AI."""
+    cache_key = _study_plan_cache_key(subject, hours_per_day, scenario, days)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    if not is_available():
+        record_fallback("study_plan", "unavailable")
         return create_fallback_study_plan(subject, hours_per_day, scenario, days)
 
     try:
-        response = client.chat.completions.create(
+        plan = _coalesced(cache_key, lambda: _request_study_plan(subject, hours_per_day, scenario, days),
+                          cacheable=_plan_complete(days))
+    except Exception as e:
+        record_fallback("study_plan", "error")
+        return create_fallback_study_plan(subject, hours_per_day, scenario, days)
+    return _top_up_study_plan(plan, subject, hours_per_day, scenario, days)
+
+
+def stream_study_plan(subject, hours_per_day, scenario, days=7):
+    """Generate a study plan, yielding each day as soon as it is complete.
+
+    Yields ``("day", day)`` events while the model is still writing and a
+    final ``("plan", plan)`` event with the complete plan. If the reply is
+    cut off, the missing days are requested once and then filled locally.
+    """
+    cache_key = _study_plan_cache_key(subject, hours_per_day, scenario, days)
+    cached = response_cache.get(cache_key)
+    if cached is None and not is_available():
+        record_fallback("study_plan", "unavailable")
+        cached = create_fallback_study_plan(subject, hours_per_day, scenario, days)
+    if cached is not None:
+        for day in cached.get("daily_schedule", []):
+            yield "day", day
+        yield "plan", cached
+        return
+
+    parser = IncrementalArrayParser("daily_schedule")
+    streamed_days = []
+    plan = None
+    try:
+        stream = chat_completion(
+            "study_plan",
             model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a helpful study planning assistant. Always respond with valid JSON only."},
-                {"role": "user", "content": prompt}
-            ],
+            messages=_study_plan_messages(subject, hours_per_day, scenario, days),
             temperature=0.7,
-            max_tokens=2000
+            max_tokens=2000,
+            stream=True,
+            stream_options={"include_usage": True},
+            **response_format("study_plan")
         )
-        
-        result = response.choices[0].message.content.strip()
-        if result.startswith("```json"):
-            result = result[7:]
-        if result.startswith("```"):
-            result = result[3:]
-        if result.endswith("```"):
-            result = result[:-3]
-        
-        return json.loads(result.strip())
+        for chunk in stream:
+            if getattr(chunk, "usage", None) is not None:
+                record_usage("study_plan", chunk.usage)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            for day in parser.feed(delta):
+                day = clean_day(day)
+                if day is not None and len(streamed_days) < days:
+                    day["day"] = len(streamed_days) + 1
+                    streamed_days.append(day)
+                    yield "day", day
+
+        parsed = _parsed(parse_study_plan, parser.buffer, subject, hours_per_day, days)
+        if not streamed_days:
+            raise ValueError("Study plan reply has no usable days")
+        parsed["daily_schedule"] = streamed_days
+        if len(streamed_days) < days:
+            try:
+                for day in _request_missing_days(subject, hours_per_day, scenario, days, streamed_days):
+                    streamed_days.append(day)
+                    yield "day", day
+            except Exception as e:
+                pass
+        plan = parsed
+        if len(streamed_days) >= days:
+            response_cache.set(cache_key, plan)
     except Exception as e:
-        return create_fallback_study_plan(subject, hours_per_day, scenario, days)
+        record_fallback("study_plan", "error")
 
+    if plan is None:
+        plan = create_fallback_study_plan(subject, hours_per_day, scenario, days)
+        plan["daily_schedule"] = streamed_days + plan["daily_schedule"][len(streamed_days):]
+    else:
+        plan = _top_up_study_plan(plan, subject, hours_per_day, scenario, days)
+    for day in plan["daily_schedule"][len(streamed_days):]:
+        yield "day", day
+
+    yield "plan", plan
 
-def generate_quiz(subject, difficulty="medium", num_questions=5):
-    """Generate a quiz with multiple-choice questions."""
-    if not client:
-        return create_fallback_quiz(subject, difficulty, num_questions)
-    
-    prompt = f"""Create a {difficulty} difficulty quiz about {subject} with {num_questions} multiple-choice questions.
 
+def _quiz_prompt(subject, difficulty, num_questions, avoid=()):
+    """Build the prompt that asks for a batch of multiple-choice questions."""
+    exclude = ""
+    if avoid:
+        listed = "\n".join(f"- {question}" for question in avoid)
+        exclude = f"\nDo not repeat any of these questions:\n{listed}\n"
+    return f"""Create a {difficulty} difficulty quiz about {subject} with {num_questions} multiple-choice questions.
+{exclude}
 Format the response as JSON with this structure:
 {{
     "quiz_title": "Quiz: {subject}",
@@ -92,40 +345,133 @@ Format the response as JSON with this structure:
 
 Only respond with valid JSON, no additional text."""
 
+
+def _request_questions(subject, difficulty, num_questions, avoid=()):
+    """Ask the model for questions and return the valid ones, even from a cut-off reply."""
+    response = chat_completion(
+        "quiz",
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": "You are an educational quiz creator. Always respond with valid JSON only."},
+            {"role": "user", "content": _quiz_prompt(subject, difficulty, num_questions, avoid)}
+        ],
+        temperature=0.7,
+        max_tokens=2000,
+        **response_format("quiz")
+    )
+
+    return _parsed(parse_questions, response.choices[0].message.content)
+
+
+def _request_quiz(subject, difficulty, num_questions):
+    """Ask the model for a quiz, requesting the missing questions once if it comes back short.
+
+    The quiz can still come back short. Raises ValueError if no question
+    is usable.
+    """
+    questions = _request_questions(subject, difficulty, num_questions)
+    if not questions:
+        raise ValueError("Quiz reply has no usable questions")
+
+    seen = {question_hash(question["question"]) for question in questions}
+    if len(questions) < num_questions:
+        record_continuation("quiz")
+        try:
+            extra = _request_questions(subject, difficulty, num_questions - len(questions),
+                                       avoid=[question["question"] for question in questions])
+        except Exception as e:
+            extra = []
+        for question in extra:
+            digest = question_hash(question["question"])
+            if digest not in seen and len(questions) < num_questions:
+                seen.add(digest)
+                questions.append(question)
+    return assemble_quiz(subject, difficulty, questions[:num_questions])
+
+
+def generate_question_batch(subject, difficulty, num_questions):
+    """Generate a batch of questions for the question bank."""
+    return _request_questions(subject, difficulty, num_questions)
+
+
+def _bank_questions(subject, difficulty, num_questions):
+    """Sample questions from the bank."""
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are an educational quiz creator. Always respond with valid JSON only."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=2000
-        )
-        
-        result = response.choices[0].message.content.strip()
-        if result.startswith("```json"):
-            result = result[7:]
-        if result.startswith("```"):
-            result = result[3:]
-        if result.endswith("```"):
-            result = result[:-3]
-        
-        return json.loads(result.strip())
+        return question_bank.sample(subject, difficulty, num_questions)
     except Exception as e:
+        return []
+
+
+def generate_quiz(subject, difficulty="medium", num_questions=5):
+    """Generate a quiz with multiple-choice questions.
+
+    Quizzes are assembled from the pre-generated question bank when it has
+    enough questions; the model is only asked directly while it fills up.
+    A refill is considered once the quiz is built, so questions from a
+    direct request are counted first.
+    """
+    quiz = _build_quiz(subject, difficulty, num_questions)
+    background_tasks.submit(request_refill, subject, difficulty)
+    return quiz
+
+
+def _build_quiz(subject, difficulty, num_questions):
+    banked = _bank_questions(subject, difficulty, num_questions)
+    if len(banked) >= num_questions:
+        return assemble_quiz(subject, difficulty, banked)
+
+    cache_key = make_key(
+        "quiz",
+        subject=normalize_subject(subject),
+        difficulty=normalize_text(difficulty),
+        num_questions=num_questions,
+    )
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    if not is_available():
+        record_fallback("quiz", "unavailable")
+        return _top_up_quiz(subject, difficulty, num_questions, banked)
+
+    def request():
+        quiz = _request_quiz(subject, difficulty, num_questions)
+        try:
+            question_bank.add_questions(subject, difficulty, quiz["questions"])
+        except Exception as e:
+            pass
+        return quiz
+
+    try:
+        quiz = _coalesced(cache_key, request, cacheable=lambda quiz: len(quiz["questions"]) >= num_questions)
+    except Exception as e:
+        record_fallback("quiz", "error")
+        return _top_up_quiz(subject, difficulty, num_questions, banked)
+    if len(quiz["questions"]) < num_questions:
+        record_fallback("quiz", "partial")
+        return _top_up_quiz(subject, difficulty, num_questions, quiz["questions"])
+    return quiz
+
+
+def _top_up_quiz(subject, difficulty, num_questions, banked):
+    """Fill the questions the bank could not supply with fallback questions."""
+    if not banked:
         return create_fallback_quiz(subject, difficulty, num_questions)
+    fallback = create_fallback_quiz(subject, difficulty, num_questions - len(banked))
+    return assemble_quiz(subject, difficulty, banked + fallback["questions"])
 
 
-def summarize_text(text, max_words=50):
-    """Summarize provided text into key points."""
-    if not client:
-        return {
-            "summary": text[:200] + "..." if len(text) > 200 else text,
-            "key_points": ["Key concept from the text", "Important information", "Main idea"],
-            "word_count": len(text.split())
-        }
-    
-    prompt = f"""Summarize the following text into approximately {max_words} words. 
+SUMMARY_CHUNK_TOKENS = int(os.environ.get("SUMMARY_CHUNK_TOKENS", "2000"))
+SUMMARY_MAP_REDUCE_THRESHOLD = int(os.environ.get("SUMMARY_MAP_REDUCE_THRESHOLD_TOKENS", "3000"))
+SUMMARY_MAX_PARALLEL = int(os.environ.get("SUMMARY_MAX_PARALLEL", "4"))
+# Longer inputs are cut to their most central sentences before the model sees them; 0 disables.
+# Kept above the map-reduce threshold so mid-sized texts are summarized in full, chunk by chunk.
+SUMMARY_INPUT_BUDGET_TOKENS = int(os.environ.get("SUMMARY_INPUT_BUDGET_TOKENS", "12000"))
+
+
+def _summary_prompt(text, max_words):
+    """Build the prompt that summarizes one piece of text."""
+    return f"""Summarize the following text into approximately {max_words} words. 
 Extract the key points and main ideas.
 
 Text to summarize:
@@ -140,50 +486,150 @@ Format the response as JSON:
 
 Only respond with valid JSON, no additional text."""
 
+
+def _reduce_prompt(sections, max_words):
+    """Build the prompt that merges partial summaries of consecutive sections."""
+    joined = "\n\n".join(sections)
+    return f"""The following are summaries of consecutive sections of one document, in order.
+Combine them into a single summary of approximately {max_words} words and
+keep the most important key points of the whole document.
+
+{joined}
+
+Format the response as JSON:
+{{
+    "summary": "The summarized text here",
+    "key_points": ["Point 1", "Point 2", "Point 3"],
+    "word_count": number
+}}
+
+Only respond with valid JSON, no additional text."""
+
+
+def _request_summary(prompt):
+    """Send one summarization prompt and parse the JSON reply."""
+    response = chat_completion(
+        "summarize",
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": "You are a text summarization assistant. Always respond with valid JSON only."},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.5,
+        max_tokens=500,
+        **response_format("summary")
+    )
+    
+    return _parsed(parse_summary, response.choices[0].message.content)
+
+
+def _format_partial(index, partial):
+    points = "\n".join(f"- {point}" for point in partial.get("key_points", []))
+    return f"Section {index + 1}: {partial.get('summary', '')}\nKey points:\n{points}"
+
+
+def _merge_partials(partials):
+    """Combine partial summaries locally when the reduce call fails."""
+    summary = " ".join(partial.get("summary", "") for partial in partials).strip()
+    key_points = []
+    for partial in partials:
+        for point in partial.get("key_points", []):
+            if point not in key_points:
+                key_points.append(point)
+    return {
+        "summary": summary,
+        "key_points": key_points[:5],
+        "word_count": len(summary.split())
+    }
+
+
+def _map_parallel(func, items):
+    if len(items) == 1:
+        return [func(items[0])]
+    with ThreadPoolExecutor(max_workers=min(SUMMARY_MAX_PARALLEL, len(items))) as pool:
+        return list(pool.map(func, items))
+
+
+def _reduce_summaries(partials, max_words):
+    """Merge partial summaries, reducing in groups while they exceed one prompt."""
+    sections = [_format_partial(i, partial) for i, partial in enumerate(partials)]
+    groups = chunk_text("\n\n".join(sections), SUMMARY_CHUNK_TOKENS) if len(partials) > 2 else []
+
+    if len(groups) > 1:
+        def reduce_group(group):
+            try:
+                return _request_summary(_reduce_prompt([group], max_words))
+            except Exception as e:
+                return None
+        merged = [partial for partial in _map_parallel(reduce_group, groups) if partial]
+        if merged and len(merged) < len(partials):
+            return _reduce_summaries(merged, max_words)
+
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a text summarization assistant. Always respond with valid JSON only."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.5,
-            max_tokens=500
-        )
-        
-        result = response.choices[0].message.content.strip()
-        if result.startswith("```json"):
-            result = result[7:]
-        if result.startswith("```"):
-            result = result[3:]
-        if result.endswith("```"):
-            result = result[:-3]
-        
-        return json.loads(result.strip())
+        return _request_summary(_reduce_prompt(sections, max_words))
     except Exception as e:
-        return {
-            "summary": text[:200] + "..." if len(text) > 200 else text,
-            "key_points": ["Key concept from the text"],
-            "word_count": len(text.split())
-        }
+        return _merge_partials(partials)
 
 
-def generate_feedback(subject, performance="good"):
-    """Generate motivational feedback for the student."""
-    messages = [
-        f"Great job studying {subject}! Keep up the excellent work!",
-        f"You're making amazing progress in {subject}!",
-        f"Your dedication to {subject} is inspiring!"
-    ]
+def _map_reduce_summary(text, max_words):
+    """Summarize token-budgeted chunks concurrently, then reduce the partial summaries."""
+    chunks = chunk_text(text, SUMMARY_CHUNK_TOKENS)
     
-    if not client:
-        return {
-            "message": random.choice(messages),
-            "tip": "Review your notes regularly for better retention.",
-            "emoji": "star"
-        }
+    def summarize_chunk(chunk):
+        try:
+            return _request_summary(_summary_prompt(chunk, max_words))
+        except Exception as e:
+            return None
     
-    prompt = f"""Generate a short, encouraging feedback message for a student who is studying {subject}.
+    partials = [partial for partial in _map_parallel(summarize_chunk, chunks) if partial]
+    if not partials:
+        raise RuntimeError("No chunk of the text could be summarized")
+    
+    summary = _reduce_summaries(partials, max_words)
+    summary["word_count"] = len(summary.get("summary", "").split())
+    return summary
+
+
+def summarize_text(text, max_words=50):
+    """Summarize provided text into key points.
+
+    Texts longer than the map-reduce threshold are split on sentence
+    boundaries and summarized chunk by chunk in parallel; inputs over the
+    larger input budget are first compressed to their most central
+    sentences. Without the model, the summary is extracted locally.
+    """
+    cache_key = make_key("summary", text=" ".join(text.split()), max_words=max_words)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    if not is_available():
+        record_fallback("summary", "unavailable")
+        return extractive_summary(text, max_words)
+
+    def request():
+        prompt_text = text
+        if SUMMARY_INPUT_BUDGET_TOKENS > 0:
+            prompt_text = compress_text(text, SUMMARY_INPUT_BUDGET_TOKENS)
+        if estimate_tokens(prompt_text) > SUMMARY_MAP_REDUCE_THRESHOLD:
+            summary = _map_reduce_summary(prompt_text, max_words)
+        else:
+            summary = _request_summary(_summary_prompt(prompt_text, max_words))
+        if not summary["key_points"]:
+            # A reply cut off before its key points keeps its summary.
+            summary["key_points"] = extractive_summary(prompt_text, max_words)["key_points"]
+        return summary
+
+    try:
+        return _coalesced(cache_key, request)
+    except Exception as e:
+        record_fallback("summary", "error")
+        return extractive_summary(text, max_words)
+
+
+def _feedback_prompt(subject, performance):
+    """Build the prompt for a short motivational feedback message."""
+    return f"""Generate a short, encouraging feedback message for a student who is studying {subject}.
 Their performance level is: {performance}
 
 Format the response as JSON:
@@ -195,83 +641,63 @@ Format the response as JSON:
 
 Only respond with valid JSON, no additional text."""
 
+
+def request_feedback(subject, performance):
+    """Ask the model for one feedback message, bypassing the cache."""
+    response = chat_completion(
+        "feedback",
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": "You are a supportive educational coach. Always respond with valid JSON only."},
+            {"role": "user", "content": _feedback_prompt(subject, performance)}
+        ],
+        temperature=0.8,
+        max_tokens=200,
+        **response_format("feedback")
+    )
+    
+    return _parsed(parse_feedback, response.choices[0].message.content)
+
+
+def create_fallback_feedback(subject):
+    """Create fallback feedback when the API is unavailable."""
+    messages = [
+        f"Great job studying {subject}! Keep up the excellent work!",
+        f"You're making amazing progress in {subject}!",
+        f"Your dedication to {subject} is inspiring!"
+    ]
+    return {
+        "message": random.choice(messages),
+        "tip": "Review your notes regularly for better retention.",
+        "emoji": "star"
+    }
+
+
+def generate_feedback(subject, performance="good"):
+    """Generate motivational feedback for the student."""
+    cache_key = make_key(
+        "feedback",
+        subject=normalize_subject(subject),
+        performance=normalize_text(performance),
+    )
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    if not is_available():
+        record_fallback("feedback", "unavailable")
+        return create_fallback_feedback(subject)
+
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a supportive educational coach. Always respond with valid JSON only."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.8,
-            max_tokens=200
-        )
-        
-        result = response.choices[0].message.content.strip()
-        if result.startswith("```json"):
-            result = result[7:]
-        if result.startswith("```"):
-            result = result[3:]
-        if result.endswith("```"):
-            result = result[:-3]
-        
-        return json.loads(result.strip())
+        return _coalesced(cache_key, lambda: request_feedback(subject, performance))
     except Exception as e:
-        messages = [
-            f"Great job studying {subject}! Keep up the excellent work!",
-            f"You're making amazing progress in {subject}!",
-            f"Your dedication to {subject} is inspiring!"
-        ]
-        return {
-            "message": random.choice(messages),
-            "tip": "Review your notes regularly for better retention.",
-            "emoji": "star"
-        }
+        record_fallback("feedback", "error")
+        return create_fallback_feedback(subject)
 
 
 def create_fallback_study_plan(subject, hours_per_day, scenario, days):
-    """Create a fallback study plan when API fails."""
-    daily_schedule = []
-    topics = ["Introduction & Basics", "Core Concepts", "Practice Problems", 
-              "Advanced Topics", "Review & Summary", "Mock Tests", "Final Review"]
-    
-    for i in range(days):
-        activities = []
-        start_hour = 9
-        remaining_hours = hours_per_day
-        
-        while remaining_hours > 0:
-            study_time = min(1, remaining_hours)
-            activities.append({
-                "time": f"{start_hour}:00 AM - {start_hour + 1}:00 AM",
-                "activity": f"Study {topics[i % len(topics)]}"
-            })
-            start_hour += 1
-            remaining_hours -= 1
-            
-            if remaining_hours > 0:
-                activities.append({
-                    "time": f"{start_hour}:00 AM - {start_hour}:15 AM",
-                    "activity": "Short break"
-                })
-        
-        daily_schedule.append({
-            "day": i + 1,
-            "focus_topic": topics[i % len(topics)],
-            "activities": activities,
-            "goals": [f"Complete {topics[i % len(topics)]}", "Take notes", "Practice exercises"]
-        })
-    
-    return {
-        "plan_title": f"Study Plan for {subject}",
-        "total_days": days,
-        "hours_per_day": hours_per_day,
-        "daily_schedule": daily_schedule,
-        "weekly_goals": [
-            f"Master {subject} fundamentals",
-            "Complete all practice problems",
-            f"Be prepared for {scenario}"
-        ]
-    }
+    """Create a local, topic-aware study plan when the API is unavailable."""
+    return build_study_plan(subject, hours_per_day, scenario, days)
 
 
 def create_fallback_quiz(subject, difficulty, num_questions):
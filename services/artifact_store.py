@@ -0,0 +1,152 @@
+import os
+import json
+import time
+import zlib
+import secrets
+import sqlite3
+import threading
+
+from services.cache_service import MemoryLRU
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+ARTIFACT_TTL_SECONDS = int(os.environ.get("ARTIFACT_TTL_SECONDS", str(7 * 24 * 3600)))
+ARTIFACT_MEMORY_ENTRIES = int(os.environ.get("ARTIFACT_MEMORY_ENTRIES", "1024"))
+ARTIFACT_DB_PATH = os.environ.get("ARTIFACT_DB_PATH", os.path.join(DATA_DIR, 'artifacts.sqlite3'))
+
+
+def encode(value):
+    """Serialize a value as zlib-compressed compact JSON."""
+    return zlib.compress(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+
+
+def decode(blob):
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+class ArtifactStore:
+    """Server-side store for generated plans and quizzes, addressed by opaque IDs.
+
+    Values are kept compressed in an in-memory LRU in front of a SQLite
+    table shared by all workers, and expire ``ttl_seconds`` after they
+    were last written. Expired rows are pruned periodically.
+
+    Each worker serves its memory copy without checking the table, so a
+    stored value must not be replaced by different content under the same
+    ID. The exception is values stored with ``pending=True``: they are
+    about to be replaced from another thread or worker, so they are never
+    kept in memory and every read sees the replacement as soon as it is
+    written.
+    """
+
+    PRUNE_EVERY = 200
+
+    def __init__(self, path=ARTIFACT_DB_PATH, ttl_seconds=ARTIFACT_TTL_SECONDS,
+                 max_entries=ARTIFACT_MEMORY_ENTRIES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.memory = MemoryLRU(max_entries)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS artifacts ("
+                "id TEXT PRIMARY KEY, kind TEXT NOT NULL, data BLOB NOT NULL, "
+                "expires_at REAL NOT NULL, pending INTEGER NOT NULL DEFAULT 0)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_artifacts_expires ON artifacts (expires_at)")
+            self._local.conn = conn
+        return conn
+
+    def put(self, kind, value, artifact_id=None, pending=False):
+        """Store a value and return its ID. Passing the ID of a pending value replaces it."""
+        artifact_id = artifact_id or secrets.token_urlsafe(18)
+        blob = encode(value)
+        expires_at = time.time() + self.ttl_seconds
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO artifacts (id, kind, data, expires_at, pending) VALUES (?, ?, ?, ?, ?)",
+                (artifact_id, kind, blob, expires_at, int(pending))
+            )
+        if pending:
+            self.memory.pop(artifact_id)
+        else:
+            self.memory.set(artifact_id, (kind, blob), expires_at)
+
+        with self._lock:
+            self._writes += 1
+            should_prune = self._writes % self.PRUNE_EVERY == 0
+        if should_prune:
+            self.prune()
+        return artifact_id
+
+    def get(self, kind, artifact_id):
+        """Return a fresh copy of the stored value, or None if it is missing, expired or another kind."""
+        if not artifact_id:
+            return None
+        entry = self.memory.get(artifact_id)
+        if entry is None:
+            row = self._connect().execute(
+                "SELECT kind, data, expires_at, pending FROM artifacts WHERE id = ?", (artifact_id,)
+            ).fetchone()
+            if row is None or row[2] < time.time():
+                return None
+            entry = (row[0], row[1])
+            if not row[3]:
+                self.memory.set(artifact_id, entry, row[2])
+
+        stored_kind, blob = entry
+        if stored_kind != kind:
+            return None
+        return decode(blob)
+
+    def is_pending(self, artifact_id):
+        """Return True while a stored value is waiting to be replaced."""
+        if not artifact_id or self.memory.get(artifact_id) is not None:
+            return False
+        row = self._connect().execute(
+            "SELECT pending FROM artifacts WHERE id = ? AND expires_at >= ?", (artifact_id, time.time())
+        ).fetchone()
+        return bool(row and row[0])
+
+    def iter_kind(self, kind, batch_size=100, include_pending=False):
+        """Yield ``(id, value)`` for every live artifact of a kind, reading in batches.
+
+        Pending values are skipped unless ``include_pending`` is set.
+        """
+        last_id = ""
+        pending_filter = "" if include_pending else " AND pending = 0"
+        while True:
+            rows = self._connect().execute(
+                "SELECT id, data FROM artifacts WHERE kind = ? AND id > ? AND expires_at >= ?"
+                f"{pending_filter} ORDER BY id LIMIT ?",
+                (kind, last_id, time.time(), batch_size)
+            ).fetchall()
+            for artifact_id, blob in rows:
+                yield artifact_id, decode(blob)
+            if len(rows) < batch_size:
+                return
+            last_id = rows[-1][0]
+
+    def delete(self, artifact_id):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM artifacts WHERE id = ?", (artifact_id,))
+        self.memory.pop(artifact_id)
+
+    def prune(self):
+        """Drop expired artifacts."""
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM artifacts WHERE expires_at < ?", (time.time(),))
+
+
+artifact_store = ArtifactStore()
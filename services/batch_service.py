@@ -0,0 +1,132 @@
+import os
+import atexit
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from services.nlp_service import analyze_document, analyze_documents_keywords
+
+BATCH_WORKERS = int(os.environ.get("BATCH_ANALYSIS_WORKERS", str(os.cpu_count() or 1)))
+BATCH_CHUNK_SIZE = int(os.environ.get("BATCH_ANALYSIS_CHUNK_SIZE", "16"))
+BATCH_MAX_DOCUMENTS = int(os.environ.get("BATCH_ANALYSIS_MAX_DOCUMENTS", "10000"))
+BATCH_MAX_CHUNK_SIZE = BATCH_CHUNK_SIZE * 4
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """Return the shared process pool, starting it on first use."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # spawn keeps worker processes free of the web server's threads and locks
+                _executor = ProcessPoolExecutor(
+                    max_workers=BATCH_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+    return _executor
+
+
+def shutdown():
+    """Stop the process pool."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True, cancel_futures=True)
+            _executor = None
+
+
+atexit.register(shutdown)
+
+
+def normalize_documents(documents, subject="general"):
+    """Accept plain strings or ``{"id", "text", "subject"}`` dicts and fill in defaults."""
+    normalized = []
+    for i, document in enumerate(documents):
+        if isinstance(document, str):
+            document = {"text": document}
+        elif not isinstance(document, dict):
+            raise ValueError(f"Document {i} must be a string or an object")
+        text = document.get("text")
+        if not isinstance(text, str):
+            raise ValueError(f"Document {i} is missing a text field")
+        normalized.append({
+            "id": document.get("id", i),
+            "text": text,
+            "subject": document.get("subject") or subject
+        })
+    return normalized
+
+
+def _result(document, analysis):
+    tips = analysis.study_tips(document["subject"])
+    return {
+        "id": document["id"],
+        "keywords": tips["keywords"],
+        "tips": tips["tips"],
+        "complexity": analysis.complexity()
+    }
+
+
+def analyze_one(document):
+    """Run keywords, study tips and complexity analysis for one document."""
+    try:
+        return _result(document, analyze_document(document["text"]))
+    except Exception as e:
+        return {"id": document["id"], "error": str(e)}
+
+
+def _analyze_chunk(chunk):
+    """Analyze a chunk of documents, scoring all their keywords in one batch."""
+    try:
+        analyses = [analyze_document(document["text"]) for document in chunk]
+        analyze_documents_keywords(analyses)
+    except Exception as e:
+        return [analyze_one(document) for document in chunk]
+
+    results = []
+    for document, analysis in zip(chunk, analyses):
+        try:
+            results.append(_result(document, analysis))
+        except Exception as e:
+            results.append({"id": document["id"], "error": str(e)})
+    return results
+
+
+def analyze_documents(documents, chunk_size=None):
+    """Analyze many documents, yielding results as chunks complete.
+
+    Documents are dispatched to the process pool in chunks of ``chunk_size``
+    with at most two chunks in flight per worker, so memory stays bounded
+    for very large batches. Results arrive in completion order; use each
+    result's ``id`` to match it to its document. ``chunk_size`` is capped
+    at ``BATCH_MAX_CHUNK_SIZE``. Batches no larger than the default chunk
+    size are analyzed in-process to avoid the dispatch overhead.
+    """
+    chunk_size = min(max(1, chunk_size or BATCH_CHUNK_SIZE), BATCH_MAX_CHUNK_SIZE)
+
+    if len(documents) <= BATCH_CHUNK_SIZE or BATCH_WORKERS <= 1:
+        for start in range(0, len(documents), chunk_size):
+            yield from _analyze_chunk(documents[start:start + chunk_size])
+        return
+
+    executor = _get_executor()
+    chunks = (documents[i:i + chunk_size] for i in range(0, len(documents), chunk_size))
+    pending = set()
+    try:
+        for chunk in chunks:
+            pending.add(executor.submit(_analyze_chunk, chunk))
+            if len(pending) >= BATCH_WORKERS * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+    finally:
+        for future in pending:
+            future.cancel()
@@ -0,0 +1,243 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+CACHE_ENABLED = os.environ.get("AI_CACHE_ENABLED", "1") not in ("0", "false", "no")
+CACHE_TTL_SECONDS = int(os.environ.get("AI_CACHE_TTL_SECONDS", str(24 * 3600)))
+CACHE_MAX_ENTRIES = int(os.environ.get("AI_CACHE_MAX_ENTRIES", "512"))
+CACHE_DISK_PATH = os.environ.get(
+    "AI_CACHE_DISK_PATH", os.path.join(DATA_DIR, 'cache', 'ai_responses.sqlite3')
+)
+CACHE_DISK_MAX_ENTRIES = int(os.environ.get("AI_CACHE_DISK_MAX_ENTRIES", "20000"))
+
+SUBJECT_ALIASES = {
+    "math": "mathematics",
+    "maths": "mathematics",
+    "calc": "calculus",
+    "bio": "biology",
+    "chem": "chemistry",
+    "phys": "physics",
+    "cs": "computer science",
+    "comp sci": "computer science",
+    "compsci": "computer science",
+    "computer_science": "computer science",
+    "eng": "english",
+    "english literature": "english",
+    "hist": "history",
+}
+
+
+def normalize_text(value):
+    """Collapse whitespace and lowercase a free-form parameter."""
+    return " ".join(str(value).split()).lower()
+
+
+def normalize_subject(subject):
+    """Normalize a subject name and map common aliases to a canonical name."""
+    normalized = normalize_text(subject).replace("_", " ")
+    return SUBJECT_ALIASES.get(normalized, normalized)
+
+
+def make_key(namespace, **params):
+    """Build a stable cache key from a namespace and normalized parameters."""
+    payload = json.dumps(params, sort_keys=True, separators=(",", ":"))
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return f"{namespace}:{digest}"
+
+
+class MemoryLRU:
+    """Thread-safe in-process LRU cache with per-entry expiry."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires_at):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DiskCache:
+    """SQLite-backed cache tier shared by every worker process on the host."""
+
+    PRUNE_EVERY = 100
+
+    def __init__(self, path, max_entries):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_responses_created ON responses (created_at)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._connect().execute(
+            "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[1] < time.time():
+            return None, 0
+        return row[0], row[1]
+
+    def set(self, key, value, expires_at):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at, expires_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, time.time(), expires_at),
+            )
+        with self._lock:
+            self._writes += 1
+            should_prune = self._writes % self.PRUNE_EVERY == 0
+        if should_prune:
+            self.prune()
+
+    def prune(self):
+        """Drop expired rows and trim the table to the configured size."""
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+            if self.max_entries > 0:
+                conn.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    "SELECT key FROM responses ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+
+    def clear(self):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM responses")
+
+
+class ResponseCache:
+    """Two-tier cache for generated responses: memory LRU in front of disk."""
+
+    def __init__(self, ttl_seconds=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES,
+                 disk_path=CACHE_DISK_PATH, disk_max_entries=CACHE_DISK_MAX_ENTRIES,
+                 enabled=CACHE_ENABLED):
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self.memory = MemoryLRU(max_entries)
+        self.disk = DiskCache(disk_path, disk_max_entries) if disk_path else None
+        self._lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "sets": 0, "errors": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def get(self, key):
+        """Return a fresh copy of the cached value for key, or None."""
+        if not self.enabled:
+            return None
+
+        raw = self.memory.get(key)
+        if raw is not None:
+            self._count("memory_hits")
+            return json.loads(raw)
+
+        if self.disk is not None:
+            try:
+                raw, expires_at = self.disk.get(key)
+            except sqlite3.Error:
+                self._count("errors")
+                raw = None
+            if raw is not None:
+                self._count("disk_hits")
+                self.memory.set(key, raw, expires_at)
+                return json.loads(raw)
+
+        self._count("misses")
+        return None
+
+    def set(self, key, value, ttl_seconds=None):
+        """Store a JSON-serializable value in both tiers."""
+        if not self.enabled:
+            return
+        raw = json.dumps(value)
+        expires_at = time.time() + (ttl_seconds or self.ttl_seconds)
+        self.memory.set(key, raw, expires_at)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, raw, expires_at)
+            except sqlite3.Error:
+                self._count("errors")
+        self._count("sets")
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self):
+        """Return hit/miss counters and tier sizes."""
+        with self._lock:
+            stats = dict(self._counters)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 4) if lookups else 0
+        stats["memory_entries"] = len(self.memory)
+        stats["memory_evictions"] = self.memory.evictions
+        stats["enabled"] = self.enabled
+        return stats
+
+
+response_cache = ResponseCache()
+
+
+def get_cache_stats():
+    """Get hit/miss counters for the AI response cache."""
+    return response_cache.stats()
@@ -0,0 +1,125 @@
+import io
+import json
+import math
+import hashlib
+import threading
+from html import escape
+
+from services.metrics import stage
+
+CHART_TITLE = 'Subjects Studied Distribution'
+
+# Matplotlib's Set3 palette, so the SVG and PNG charts look alike.
+PALETTE = ['#8dd3c7', '#ffffb3', '#bebada', '#fb8072', '#80b1d3', '#fdb462',
+           '#b3de69', '#fccde5', '#d9d9d9', '#bc80bd', '#ccebc5', '#ffed6f']
+
+_rendered = {}
+_rendered_lock = threading.Lock()
+
+
+def chart_data(subjects):
+    """Return the slices to draw, with a placeholder when there is no data."""
+    return dict(subjects) if subjects else {"No data yet": 1}
+
+
+def stats_version(subjects):
+    """Return a short content hash of the subject counts."""
+    payload = json.dumps(sorted(chart_data(subjects).items()), separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def render_subject_chart_svg(subjects):
+    """Render the subject distribution as a standalone SVG pie chart."""
+    subjects = chart_data(subjects)
+    total = sum(subjects.values())
+    width, height = 640, 420
+    cx, cy, r = 210, 230, 160
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" '
+        f'width="{width}" height="{height}" font-family="sans-serif">',
+        f'<text x="{width / 2}" y="32" text-anchor="middle" font-size="18" '
+        f'font-weight="bold">{escape(CHART_TITLE)}</text>',
+    ]
+
+    # Slices start at 12 o'clock and run counterclockwise, like matplotlib's startangle=90.
+    angle = math.pi / 2
+    for i, (label, value) in enumerate(subjects.items()):
+        color = PALETTE[i % len(PALETTE)]
+        fraction = value / total
+        sweep = fraction * 2 * math.pi
+        if fraction >= 1:
+            parts.append(f'<circle cx="{cx}" cy="{cy}" r="{r}" fill="{color}" stroke="#fff"/>')
+        else:
+            x1, y1 = cx + r * math.cos(angle), cy - r * math.sin(angle)
+            x2, y2 = cx + r * math.cos(angle + sweep), cy - r * math.sin(angle + sweep)
+            large_arc = 1 if sweep > math.pi else 0
+            parts.append(
+                f'<path d="M{cx},{cy} L{x1:.2f},{y1:.2f} A{r},{r} 0 {large_arc} 0 {x2:.2f},{y2:.2f} Z" '
+                f'fill="{color}" stroke="#fff"/>'
+            )
+
+        mid = angle + sweep / 2
+        lx, ly = cx + r * 0.6 * math.cos(mid), cy - r * 0.6 * math.sin(mid)
+        parts.append(
+            f'<text x="{lx:.2f}" y="{ly:.2f}" text-anchor="middle" dominant-baseline="middle" '
+            f'font-size="13">{fraction * 100:.1f}%</text>'
+        )
+        angle += sweep
+
+        ky = 80 + i * 24
+        parts.append(f'<rect x="410" y="{ky - 12}" width="14" height="14" fill="{color}"/>')
+        parts.append(f'<text x="432" y="{ky}" font-size="14">{escape(str(label))}</text>')
+
+    parts.append('</svg>')
+    return '\n'.join(parts).encode('utf-8')
+
+
+def render_subject_chart_png(subjects):
+    """Render the subject distribution as a PNG with matplotlib."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    subjects = chart_data(subjects)
+
+    fig, ax = plt.subplots(figsize=(8, 6))
+    colors = plt.cm.Set3(range(len(subjects)))
+
+    ax.pie(
+        subjects.values(),
+        labels=subjects.keys(),
+        autopct='%1.1f%%',
+        colors=colors,
+        startangle=90
+    )
+
+    ax.set_title(CHART_TITLE, fontsize=14, fontweight='bold')
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=100, bbox_inches='tight')
+    plt.close(fig)
+    return buf.getvalue()
+
+
+RENDERERS = {
+    'svg': ('image/svg+xml', render_subject_chart_svg),
+    'png': ('image/png', render_subject_chart_png),
+}
+
+
+def get_subject_chart(subjects, fmt='svg'):
+    """Return ``(body, mimetype, version)``, rendering only when the counts change."""
+    mimetype, render = RENDERERS[fmt]
+    version = stats_version(subjects)
+
+    with _rendered_lock:
+        cached = _rendered.get(fmt)
+    if cached is not None and cached[0] == version:
+        return cached[1], mimetype, version
+
+    with stage(f"chart.{fmt}"):
+        body = render(subjects)
+    with _rendered_lock:
+        _rendered[fmt] = (version, body)
+    return body, mimetype, version
@@ -0,0 +1,131 @@
+import os
+import json
+import time
+import threading
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+CONTENT_FILE = os.path.join(DATA_DIR, 'educational_content.json')
+SUBJECTS_DIR = os.path.join(DATA_DIR, 'subjects')
+RELOAD_CHECK_INTERVAL = float(os.environ.get("CONTENT_RELOAD_CHECK_INTERVAL", "1"))
+LAZY_CACHE_MAX_ENTRIES = 4096
+
+EMPTY_CONTENT = {
+    "subjects": {},
+    "study_tips_templates": [],
+    "motivational_messages": []
+}
+
+
+def normalize_subject_key(subject):
+    """Turn a subject name into the key used in the content catalog."""
+    return "_".join(str(subject).lower().split())
+
+
+def _file_signature(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class ContentIndex:
+    """Immutable snapshot of the educational content catalog."""
+
+    def __init__(self, content, signature):
+        self.content = content
+        self.signature = signature
+        self.subjects = {
+            normalize_subject_key(key): entry
+            for key, entry in content.get("subjects", {}).items()
+        }
+
+
+class ContentRepository:
+    """Educational content loaded once, indexed by subject and hot-reloaded.
+
+    The main catalog file is parsed into a ``ContentIndex`` that is swapped in
+    atomically whenever the file's mtime or size changes. Checks are
+    throttled to one ``stat`` per ``check_interval`` seconds. Large catalogs
+    can also keep one ``<subject_key>.json`` file per subject in
+    ``subjects_dir``; those are loaded on first use and reloaded the same way.
+    """
+
+    def __init__(self, path=CONTENT_FILE, subjects_dir=SUBJECTS_DIR,
+                 check_interval=RELOAD_CHECK_INTERVAL):
+        self.path = path
+        self.subjects_dir = subjects_dir
+        self.check_interval = check_interval
+        self._index = None
+        self._checked_at = 0.0
+        self._lazy = {}
+        self._lock = threading.Lock()
+
+    def _load(self, signature):
+        if signature is None:
+            return ContentIndex(EMPTY_CONTENT, None)
+        try:
+            with open(self.path, 'r') as f:
+                return ContentIndex(json.load(f), signature)
+        except (OSError, ValueError):
+            if self._index is not None:
+                return self._index
+            return ContentIndex(EMPTY_CONTENT, None)
+
+    def index(self):
+        """Return the current index, reloading it if the file has changed."""
+        now = time.monotonic()
+        index = self._index
+        if index is not None and now - self._checked_at < self.check_interval:
+            return index
+
+        with self._lock:
+            if self._index is None or now - self._checked_at >= self.check_interval:
+                signature = _file_signature(self.path)
+                if self._index is None or signature != self._index.signature:
+                    self._index = self._load(signature)
+                self._checked_at = now
+            return self._index
+
+    def _lazy_subject(self, key):
+        now = time.monotonic()
+        cached = self._lazy.get(key)
+        if cached is not None and now - cached[2] < self.check_interval:
+            return cached[0]
+
+        path = os.path.join(self.subjects_dir, f"{key}.json")
+        signature = _file_signature(path)
+        if cached is not None and signature == cached[1]:
+            entry = cached[0]
+        elif signature is None:
+            entry = None
+        else:
+            try:
+                with open(path, 'r') as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                entry = cached[0] if cached is not None else None
+        if len(self._lazy) >= LAZY_CACHE_MAX_ENTRIES:
+            self._lazy.clear()
+        self._lazy[key] = (entry, signature, now)
+        return entry
+
+    def content(self):
+        """Return the full catalog as loaded from disk."""
+        return self.index().content
+
+    def subject(self, subject):
+        """Return the catalog entry for a subject, or None if it is unknown."""
+        key = normalize_subject_key(subject)
+        entry = self.index().subjects.get(key)
+        is_file_name = os.path.basename(key) == key and not key.startswith(".")
+        if entry is None and self.subjects_dir and is_file_name:
+            entry = self._lazy_subject(key)
+        return entry
+
+    def subject_keys(self):
+        """Return the keys of all subjects in the main catalog."""
+        return list(self.index().subjects)
+
+
+content_repository = ContentRepository()
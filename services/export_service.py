@@ -0,0 +1,195 @@
+import re
+import csv
+import json
+import hashlib
+from datetime import date, datetime, time, timedelta, timezone
+
+SCHEDULE_FIELDS = ["Day", "Focus Topic", "Time", "Activity", "Goals"]
+DEFAULT_ROW = {"Day": 1, "Focus Topic": "Study", "Time": "9:00 AM", "Activity": "Begin studying", "Goals": "Complete tasks"}
+
+TIME_RANGE = re.compile(r"^\s*(.+?)\s*(?:-|–|—|to)\s*(.+?)\s*$", re.IGNORECASE)
+CLOCK = re.compile(r"^(\d{1,2})(?::(\d{2}))?\s*([ap])?\.?\s*m?\.?$", re.IGNORECASE)
+
+
+class _Line:
+    """File-like object whose write() hands back the text instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows, fields):
+    """Yield CSV text line by line for an iterable of row dicts."""
+    writer = csv.DictWriter(_Line(), fieldnames=fields, extrasaction='ignore')
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def schedule_rows(study_plan):
+    """Yield one row per activity in a study plan's daily schedule."""
+    empty = True
+    for day_schedule in study_plan.get("daily_schedule", []):
+        day = day_schedule.get("day", 1)
+        focus = day_schedule.get("focus_topic", "Study")
+        goals = ", ".join(day_schedule.get("goals", []))
+
+        for activity in day_schedule.get("activities", []):
+            empty = False
+            yield {
+                "Day": day,
+                "Focus Topic": focus,
+                "Time": activity.get("time", ""),
+                "Activity": activity.get("activity", ""),
+                "Goals": goals
+            }
+
+    if empty:
+        yield dict(DEFAULT_ROW)
+
+
+def iter_schedule_csv(study_plan):
+    """Stream a study plan's schedule as CSV."""
+    return iter_csv(schedule_rows(study_plan), SCHEDULE_FIELDS)
+
+
+def parse_clock(value, default_meridiem=None):
+    """Parse "9:00 AM", "9 pm" or "14:30" into ``(time, meridiem)``, or None."""
+    match = CLOCK.match(value.strip())
+    if not match:
+        return None
+    hour, minute = int(match.group(1)), int(match.group(2) or 0)
+    meridiem = (match.group(3) or default_meridiem or "").lower() or None
+    if minute > 59:
+        return None
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem == "p" else 0)
+    elif hour > 23:
+        return None
+    return time(hour, minute), meridiem
+
+
+def parse_time_range(value):
+    """Parse a "9:00 AM - 10:00 AM" block into ``(start, end)`` times, or None.
+
+    A missing AM/PM on the start time is taken from the end time
+    ("9 - 10:30 AM"), unless that would put the start after the end
+    ("11:00 - 1:00 PM" starts in the morning).
+    """
+    match = TIME_RANGE.match(str(value or ""))
+    if not match:
+        return None
+    start, end = parse_clock(match.group(1)), parse_clock(match.group(2))
+    if start is None or end is None:
+        return None
+    (start, start_meridiem), (end, end_meridiem) = start, end
+    if start_meridiem is None and end_meridiem and 1 <= start.hour <= 12:
+        start = parse_clock(match.group(1), default_meridiem=end_meridiem)[0]
+        if start >= end:
+            start = parse_clock(match.group(1), default_meridiem="a")[0]
+    if end <= start:
+        return None
+    return start, end
+
+
+def _ics_escape(text):
+    return (str(text).replace("\\", "\\\\").replace(";", "\\;")
+            .replace(",", "\\,").replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+def _ics_fold(line):
+    """Fold a content line to 75 octets as RFC 5545 requires."""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    parts = []
+    limit = 75
+    while encoded:
+        cut = min(limit, len(encoded))
+        # Do not split inside a multi-byte UTF-8 sequence.
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode("utf-8"))
+        encoded = encoded[cut:]
+        limit = 74
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def iter_schedule_ics(study_plan, start_date=None, plan_id=""):
+    """Stream a study plan's timed activities as an iCalendar file.
+
+    Day 1 falls on ``start_date`` (today by default). Times are floating
+    local times, so events land at the same clock time in any calendar.
+    Activities whose time cannot be parsed are skipped.
+    """
+    start_date = start_date or date.today()
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    title = study_plan.get("plan_title", "Study Plan")
+    uid_base = plan_id or hashlib.sha1(json.dumps(study_plan, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+    for line in ("BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//AI Study Pal//Study Plan//EN",
+                 "CALSCALE:GREGORIAN", f"X-WR-CALNAME:{_ics_escape(title)}"):
+        yield _ics_fold(line)
+
+    for day_schedule in study_plan.get("daily_schedule", []):
+        try:
+            day = int(day_schedule.get("day", 1))
+        except (TypeError, ValueError):
+            continue
+        day_date = start_date + timedelta(days=day - 1)
+        focus = day_schedule.get("focus_topic", "Study")
+        goals = ", ".join(day_schedule.get("goals", []))
+
+        for index, activity in enumerate(day_schedule.get("activities", [])):
+            block = parse_time_range(activity.get("time", ""))
+            if block is None:
+                continue
+            start, end = (datetime.combine(day_date, t) for t in block)
+            summary = f"{focus}: {activity.get('activity', 'Study')}"
+            lines = [
+                "BEGIN:VEVENT",
+                f"UID:{uid_base}-{day}-{index}@ai-study-pal",
+                f"DTSTAMP:{stamp}",
+                f"DTSTART:{start.strftime('%Y%m%dT%H%M%S')}",
+                f"DTEND:{end.strftime('%Y%m%dT%H%M%S')}",
+                f"SUMMARY:{_ics_escape(summary)}",
+            ]
+            if goals:
+                lines.append(f"DESCRIPTION:{_ics_escape('Goals: ' + goals)}")
+            lines.append("END:VEVENT")
+            yield "".join(_ics_fold(line) for line in lines)
+
+    yield _ics_fold("END:VCALENDAR")
+
+
+BULK_FIELDS = ["Plan ID"] + SCHEDULE_FIELDS
+
+
+def export_id(artifact_id):
+    """Stable pseudonymous ID for an exported plan; store IDs double as session credentials."""
+    return hashlib.sha256(artifact_id.encode("utf-8")).hexdigest()[:16]
+
+
+def _finished(plans):
+    for artifact_id, plan in plans:
+        if plan.get("daily_schedule"):
+            yield export_id(artifact_id), plan
+
+
+def iter_plans_csv(plans):
+    """Stream many ``(artifact_id, plan)`` pairs as one CSV with a plan ID column."""
+    def rows():
+        for plan_id, plan in _finished(plans):
+            for row in schedule_rows(plan):
+                row["Plan ID"] = plan_id
+                yield row
+
+    return iter_csv(rows(), BULK_FIELDS)
+
+
+def iter_plans_ndjson(plans):
+    """Stream many ``(artifact_id, plan)`` pairs as newline-delimited JSON."""
+    for plan_id, plan in _finished(plans):
+        yield json.dumps({"id": plan_id, "plan": plan}) + "\n"
@@ -0,0 +1,131 @@
+import re
+from collections import Counter
+
+from services.metrics import stage
+from services.nlp_service import split_sentences, chunk_text, estimate_tokens, FALLBACK_STOPWORDS
+
+# Sentences longer than this are ranked as separate pieces.
+MAX_UNIT_TOKENS = 120
+DAMPING = 0.85
+ITERATIONS = 50
+TOLERANCE = 1e-6
+
+WORD = re.compile(r"[a-z][a-z'-]+")
+
+
+def split_units(text):
+    """Split text into rankable sentences, breaking up run-on sentences."""
+    units = []
+    for sentence in split_sentences(text):
+        if estimate_tokens(sentence) > MAX_UNIT_TOKENS:
+            units.extend(chunk_text(sentence, MAX_UNIT_TOKENS))
+        else:
+            units.append(sentence)
+    return units
+
+
+def _textrank(sentences):
+    """TextRank over TF-IDF cosine similarity, without building the n x n matrix.
+
+    With L2-normalized rows X, the similarity matrix is ``X @ X.T`` minus
+    the identity, so each power iteration is two sparse products.
+    """
+    import numpy as np
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    try:
+        vectors = TfidfVectorizer(stop_words='english', sublinear_tf=True).fit_transform(sentences)
+    except ValueError:
+        # Nothing but stopwords.
+        return np.zeros(len(sentences))
+
+    n = len(sentences)
+    has_terms = np.asarray(vectors.getnnz(axis=1) > 0)
+
+    def similarity(v):
+        return vectors @ (vectors.T @ v) - np.where(has_terms, v, 0.0)
+
+    degree = similarity(np.ones(n))
+    connected = degree > 1e-12
+    inverse_degree = np.zeros(n)
+    inverse_degree[connected] = 1.0 / degree[connected]
+
+    scores = np.full(n, 1.0 / n)
+    for _ in range(ITERATIONS):
+        updated = (1 - DAMPING) / n + DAMPING * similarity(scores * inverse_degree)
+        if np.abs(updated - scores).sum() < TOLERANCE:
+            scores = updated
+            break
+        scores = updated
+    scores[~connected] = 0.0
+    return scores
+
+
+def _frequency_scores(sentences):
+    """Score sentences by the average corpus frequency of their content words."""
+    tokenized = [[w for w in WORD.findall(s.lower()) if w not in FALLBACK_STOPWORDS] for s in sentences]
+    counts = Counter(word for words in tokenized for word in words)
+    top = max(counts.values(), default=1)
+    return [sum(counts[w] for w in words) / (top * len(words)) if words else 0.0 for words in tokenized]
+
+
+def rank_sentences(sentences):
+    """Return one centrality score per sentence; higher is more representative."""
+    if len(sentences) < 2:
+        return [1.0] * len(sentences)
+    with stage("nlp.rank_sentences"):
+        try:
+            return [float(score) for score in _textrank(sentences)]
+        except ImportError:
+            return _frequency_scores(sentences)
+
+
+def _by_rank(sentences):
+    scores = rank_sentences(sentences)
+    # Earlier sentences win ties.
+    return sorted(range(len(sentences)), key=lambda i: (-scores[i], i))
+
+
+def compress_text(text, max_tokens):
+    """Keep the most central sentences that fit in ``max_tokens``, in their original order."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    sentences = split_units(text)
+    chosen, used = [], 0
+    for i in _by_rank(sentences):
+        tokens = estimate_tokens(sentences[i]) + 1
+        if used + tokens > max_tokens:
+            continue
+        chosen.append(i)
+        used += tokens
+    return " ".join(sentences[i] for i in sorted(chosen))
+
+
+def extractive_summary(text, max_words=50, num_key_points=3):
+    """Summarize text locally from its most central sentences.
+
+    Returns the same shape as the model's summaries: the summary is the top
+    sentences in document order, up to about ``max_words`` words, and the
+    key points are the top sentences by rank.
+    """
+    sentences = split_units(text)
+    if not sentences:
+        return {"summary": "", "key_points": [], "word_count": 0}
+
+    ranked = _by_rank(sentences)
+    chosen, words = [], 0
+    for i in ranked:
+        length = len(sentences[i].split())
+        if chosen and words + length > max_words:
+            continue
+        chosen.append(i)
+        words += length
+        if words >= max_words:
+            break
+
+    summary = " ".join(sentences[i] for i in sorted(chosen))
+    return {
+        "summary": summary,
+        "key_points": [sentences[i] for i in ranked[:num_key_points]],
+        "word_count": len(summary.split())
+    }
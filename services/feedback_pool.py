@@ -0,0 +1,80 @@
+import os
+import time
+import random
+
+from services.ai_service import request_feedback, create_fallback_feedback
+from services.metrics import record_fallback
+from services.cache_service import MemoryLRU, response_cache, make_key, normalize_subject, normalize_text
+from services.llm_client import is_available
+from services.task_queue import refill_tasks
+
+FEEDBACK_POOL_SIZE = int(os.environ.get("FEEDBACK_POOL_SIZE", "5"))
+FEEDBACK_POOL_TTL_SECONDS = int(os.environ.get("FEEDBACK_POOL_TTL_SECONDS", str(7 * 24 * 3600)))
+FEEDBACK_POOL_MAX_BUCKETS = 512
+
+
+def performance_bucket(score):
+    """Map a percentage score to the performance level used for feedback."""
+    if score >= 80:
+        return "excellent"
+    if score >= 60:
+        return "good"
+    return "needs improvement"
+
+
+class FeedbackPool:
+    """Precomputed feedback messages per (subject, performance) bucket.
+
+    ``get`` never waits on the model: it picks a message from the bucket's
+    pool, or returns offline feedback when the pool is still empty. Pools
+    below ``size`` messages are topped up on the refill queue, and are
+    shared between workers through the response cache. Each worker keeps
+    its copy of a pool in memory, empty ones included, and only re-reads
+    the response cache for a short pool while the model is available.
+    """
+
+    def __init__(self, size=FEEDBACK_POOL_SIZE, ttl_seconds=FEEDBACK_POOL_TTL_SECONDS, tasks=refill_tasks):
+        self.size = size
+        self.ttl_seconds = ttl_seconds
+        self.tasks = tasks
+        self._pools = MemoryLRU(FEEDBACK_POOL_MAX_BUCKETS)
+
+    def _key(self, subject, performance):
+        return make_key("feedback_pool", subject=normalize_subject(subject), performance=normalize_text(performance))
+
+    def _pool(self, key, fillable):
+        pool = self._pools.get(key)
+        if pool is None or (fillable and len(pool) < self.size):
+            # Another worker may have filled the bucket since it was read.
+            pool = response_cache.get(key) or pool or []
+            self._pools.set(key, pool, time.time() + self.ttl_seconds)
+        return pool
+
+    def get(self, subject, performance):
+        """Return ``(feedback, pooled)``; ``pooled`` is False for offline fallback feedback."""
+        key = self._key(subject, performance)
+        fillable = is_available()
+        pool = self._pool(key, fillable)
+        if fillable and len(pool) < self.size:
+            self.request_refill(subject, performance)
+        if pool:
+            return dict(random.choice(pool)), True
+        record_fallback("feedback_pool", "empty")
+        return create_fallback_feedback(subject), False
+
+    def request_refill(self, subject, performance):
+        """Schedule a background top-up of a bucket, unless one is already queued or the model is unavailable."""
+        if not is_available():
+            return
+        key = self._key(subject, performance)
+        self.tasks.offer_once(key, self.refill, key, subject, performance)
+
+    def refill(self, key, subject, performance):
+        pool = list(response_cache.get(key) or self._pools.get(key) or [])
+        while len(pool) < self.size and is_available() and not self.tasks.closed:
+            pool.append(request_feedback(subject, performance))
+            self._pools.set(key, list(pool), time.time() + self.ttl_seconds)
+            response_cache.set(key, pool, ttl_seconds=self.ttl_seconds)
+
+
+feedback_pool = FeedbackPool()
@@ -0,0 +1,53 @@
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+
+def lock(f, shared=False):
+    """Block until an advisory lock on the open file is acquired."""
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+
+
+def try_lock(f, shared=False):
+    """Acquire an advisory lock on the open file without blocking. Returns False if it is held."""
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def unlock(f):
+    """Release a lock taken with lock()."""
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def locked_file(path, mode='a', shared=False, **kwargs):
+    """Open a file and hold a cross-process lock on it for the duration."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(path, mode, **kwargs) as f:
+        lock(f, shared=shared)
+        try:
+            yield f
+        finally:
+            f.flush()
+            unlock(f)
@@ -0,0 +1,166 @@
+import json
+import re
+
+
+def strip_code_fences(result):
+    """Remove the markdown code fences models like to wrap JSON in."""
+    result = result.strip()
+    if result.startswith("```json"):
+        result = result[7:]
+    if result.startswith("```"):
+        result = result[3:]
+    if result.endswith("```"):
+        result = result[:-3]
+    return result.strip()
+
+
+class IncrementalArrayParser:
+    """Pull complete elements out of a JSON array while the document is still streaming.
+
+    Feed raw text chunks as they arrive; each call to ``feed`` returns the
+    elements of the array stored under ``key`` that became complete with
+    that chunk. Only the new characters are scanned on every call.
+    """
+
+    def __init__(self, key):
+        self._key_pattern = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+        self.buffer = ""
+        self._pos = 0
+        self._in_array = False
+        self._done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._element_start = None
+
+    @property
+    def done(self):
+        return self._done
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        completed = []
+
+        if not self._in_array and not self._done:
+            match = self._key_pattern.search(self.buffer)
+            if not match:
+                return completed
+            self._in_array = True
+            self._pos = match.end()
+
+        buffer = self.buffer
+        i = self._pos
+        while self._in_array and i < len(buffer):
+            char = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 0:
+                    self._element_start = i
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0:
+                    self._in_array = False
+                    self._done = True
+                else:
+                    self._depth -= 1
+                    if self._depth == 0:
+                        element = buffer[self._element_start:i + 1]
+                        self._element_start = None
+                        try:
+                            completed.append(json.loads(element))
+                        except ValueError:
+                            pass
+            i += 1
+
+        self._pos = i
+        return completed
+
+
+TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+
+def repair_json(text):
+    """Close a truncated JSON document after its last complete value.
+
+    Incomplete keys, strings and numbers at the end are dropped, then the
+    open arrays and objects are closed. Returns None if no object or array
+    starts in ``text``.
+    """
+    start = next((i for i, char in enumerate(text) if char in "{["), None)
+    if start is None:
+        return None
+
+    closers = []
+    expecting_key = []
+    in_string = escape = string_is_key = False
+    cut = (start + 1, "}" if text[start] == "{" else "]")
+
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+                if not string_is_key:
+                    cut = (i + 1, "".join(reversed(closers)))
+        elif char == '"':
+            in_string = True
+            string_is_key = bool(expecting_key) and expecting_key[-1]
+        elif char in "{[":
+            closers.append("}" if char == "{" else "]")
+            expecting_key.append(char == "{")
+            cut = (i + 1, "".join(reversed(closers)))
+        elif char in "}]":
+            closers.pop()
+            expecting_key.pop()
+            if not closers:
+                return text[start:i + 1]
+            cut = (i + 1, "".join(reversed(closers)))
+        elif char == ",":
+            if closers[-1] == "}":
+                expecting_key[-1] = True
+            cut = (i, "".join(reversed(closers)))
+        elif char == ":":
+            expecting_key[-1] = False
+
+    position, closing = cut
+    return text[start:position] + closing
+
+
+def parse_json_lenient(text):
+    """Parse a model reply, repairing code fences, trailing commas and truncation.
+
+    Returns ``(value, complete)``; ``complete`` is False when the end of the
+    document had to be cut off, and ``value`` is None if nothing parsed.
+    """
+    text = strip_code_fences(text or "")
+    for candidate in (text, TRAILING_COMMA.sub(r"\1", text)):
+        try:
+            return json.loads(candidate), True
+        except ValueError:
+            pass
+
+    repaired = repair_json(text)
+    if repaired is not None:
+        for candidate in (repaired, TRAILING_COMMA.sub(r"\1", repaired)):
+            try:
+                return json.loads(candidate), False
+            except ValueError:
+                pass
+    return None, False
+
+
+def salvage_array(text, key):
+    """Return every element of the array under ``key`` that parses on its own."""
+    return IncrementalArrayParser(key).feed(text or "")
@@ -0,0 +1,203 @@
+import os
+import glob
+import json
+import hashlib
+import threading
+
+from services.content_repository import content_repository
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+INDEX_PATH = os.environ.get(
+    "KEYWORD_INDEX_PATH", os.path.join(DATA_DIR, 'cache', 'keyword_idf.npz')
+)
+CORPUS_DIR = os.environ.get("KEYWORD_CORPUS_DIR", "")
+
+
+def _identity(tokens):
+    return tokens
+
+
+def _content_documents(content):
+    """Yield corpus documents from the educational content catalog."""
+    for entry in content.get("subjects", {}).values():
+        yield entry.get("sample_content", "")
+        yield " ".join(entry.get("topics", []))
+    # Study tips and motivational messages are generic study language, which
+    # is exactly the vocabulary keywords should be penalized for.
+    for template in content.get("study_tips_templates", []):
+        yield template.replace("{keyword}", "")
+    for message in content.get("motivational_messages", []):
+        yield message
+
+
+def _corpus_files(corpus_dir):
+    if not corpus_dir:
+        return []
+    return sorted(glob.glob(os.path.join(corpus_dir, '**', '*.txt'), recursive=True))
+
+
+def corpus_signature(content_signature, corpus_dir=CORPUS_DIR):
+    """Fingerprint the inputs of the IDF table so stale artifacts are rebuilt."""
+    parts = [repr(content_signature)]
+    for path in _corpus_files(corpus_dir):
+        st = os.stat(path)
+        parts.append(f"{path}:{st.st_mtime_ns}:{st.st_size}")
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+class KeywordEngine:
+    """TF-IDF keyword scorer over a precomputed corpus IDF table.
+
+    The IDF table is a sorted term array plus a float32 IDF array, persisted
+    as a compressed ``.npz``. At request time a batch of token lists becomes
+    one sparse term-count matrix that is weighted by IDF in a single
+    vectorized operation; terms never seen in the corpus get the maximum IDF.
+    """
+
+    def __init__(self, terms, idf, n_documents, signature):
+        import numpy as np
+
+        self.terms = terms
+        self.idf = idf
+        self.n_documents = n_documents
+        self.signature = signature
+        self.content_signature = None
+        self.default_idf = float(np.log((1 + n_documents) / 1) + 1)
+
+    @classmethod
+    def build(cls, documents, signature):
+        """Fit the IDF table on tokenized corpus documents."""
+        import numpy as np
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        documents = [tokens for tokens in documents if tokens]
+        if not documents:
+            return cls(np.array([], dtype=str), np.array([], dtype=np.float32), 0, signature)
+
+        vectorizer = TfidfVectorizer(analyzer=_identity, lowercase=False, smooth_idf=True)
+        vectorizer.fit(documents)
+        terms = vectorizer.get_feature_names_out().astype(str)
+        return cls(terms, vectorizer.idf_.astype(np.float32), len(documents), signature)
+
+    def save(self, path):
+        import numpy as np
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(
+                f, terms=self.terms, idf=self.idf,
+                meta=np.array(json.dumps({"n_documents": self.n_documents, "signature": self.signature}))
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        import numpy as np
+
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            return cls(data["terms"], data["idf"], meta["n_documents"], meta["signature"])
+
+    def score(self, token_lists):
+        """Return a sparse documents x batch-vocabulary TF-IDF matrix and its terms."""
+        import numpy as np
+        from scipy.sparse import csr_matrix
+
+        vocabulary = {}
+        indices = []
+        indptr = [0]
+        for tokens in token_lists:
+            for token in tokens:
+                indices.append(vocabulary.setdefault(token, len(vocabulary)))
+            indptr.append(len(indices))
+
+        counts = csr_matrix(
+            (np.ones(len(indices), dtype=np.float32), indices, indptr),
+            shape=(len(token_lists), len(vocabulary))
+        )
+        counts.sum_duplicates()
+
+        batch_terms = list(vocabulary)
+        idf = np.full(len(batch_terms), self.default_idf, dtype=np.float32)
+        if len(self.terms) and batch_terms:
+            lookup = np.array(batch_terms, dtype=str)
+            positions = np.minimum(np.searchsorted(self.terms, lookup), len(self.terms) - 1)
+            known = self.terms[positions] == lookup
+            idf[known] = self.idf[positions[known]]
+
+        return csr_matrix(counts.multiply(idf)), batch_terms
+
+    def top_keywords(self, token_lists, num_keywords=5):
+        """Return the ``num_keywords`` highest TF-IDF terms of each token list."""
+        import numpy as np
+
+        if not token_lists:
+            return []
+        weights, batch_terms = self.score(token_lists)
+
+        keywords = []
+        for row in range(weights.shape[0]):
+            start, end = weights.indptr[row], weights.indptr[row + 1]
+            columns = weights.indices[start:end]
+            scores = weights.data[start:end]
+            # Columns follow first appearance, so ties keep document order.
+            order = np.argsort(columns, kind='stable')
+            columns, scores = columns[order], scores[order]
+            best = np.argsort(-scores, kind='stable')[:num_keywords]
+            keywords.append([batch_terms[columns[i]] for i in best])
+        return keywords
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def build_keyword_index(path=INDEX_PATH, corpus_dir=CORPUS_DIR):
+    """Rebuild the IDF table from the content catalog and configured corpus and persist it."""
+    from services.nlp_service import analyze_document
+
+    index = content_repository.index()
+    documents = list(_content_documents(index.content))
+    for file_path in _corpus_files(corpus_dir):
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            documents.append(f.read())
+
+    engine = KeywordEngine.build(
+        [analyze_document(document).content_words for document in documents],
+        corpus_signature(index.signature, corpus_dir)
+    )
+    try:
+        engine.save(path)
+    except OSError:
+        pass
+    return engine
+
+
+def get_keyword_engine():
+    """Return the keyword engine, loading or rebuilding its IDF table when stale.
+
+    Returns None when numpy, scipy or scikit-learn are unavailable.
+    """
+    global _engine
+    engine = _engine
+    content_signature = content_repository.index().signature
+    if engine is not None and engine.content_signature == content_signature:
+        return engine
+
+    with _engine_lock:
+        if _engine is not None and _engine.content_signature == content_signature:
+            return _engine
+        try:
+            signature = corpus_signature(content_signature)
+            try:
+                engine = KeywordEngine.load(INDEX_PATH)
+            except (OSError, ValueError, KeyError):
+                engine = None
+            if engine is None or engine.signature != signature:
+                engine = build_keyword_index()
+        except ImportError:
+            return None
+        engine.content_signature = content_signature
+        _engine = engine
+        return engine
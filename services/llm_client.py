@@ -0,0 +1,272 @@
+import os
+import time
+import random
+import threading
+
+from services.metrics import stage, record_usage
+
+api_key = os.environ.get("OPENAI_API_KEY")
+
+MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("LLM_MAX_KEEPALIVE_CONNECTIONS", "10"))
+CONNECT_TIMEOUT = float(os.environ.get("LLM_CONNECT_TIMEOUT", "3"))
+MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "2"))
+RETRY_BASE_DELAY = float(os.environ.get("LLM_RETRY_BASE_DELAY", "0.25"))
+RETRY_MAX_DELAY = float(os.environ.get("LLM_RETRY_MAX_DELAY", "2"))
+RETRY_BUDGET_RATIO = float(os.environ.get("LLM_RETRY_BUDGET_RATIO", "0.2"))
+RETRY_BUDGET_MIN_PER_SECOND = float(os.environ.get("LLM_RETRY_BUDGET_MIN_PER_SECOND", "0.5"))
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get("LLM_BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.environ.get("LLM_BREAKER_RESET_SECONDS", "30"))
+
+OPERATION_DEADLINES = {
+    "study_plan": float(os.environ.get("LLM_DEADLINE_STUDY_PLAN", "40")),
+    "quiz": float(os.environ.get("LLM_DEADLINE_QUIZ", "40")),
+    "summarize": float(os.environ.get("LLM_DEADLINE_SUMMARIZE", "25")),
+    "feedback": float(os.environ.get("LLM_DEADLINE_FEEDBACK", "8")),
+}
+DEFAULT_DEADLINE = float(os.environ.get("LLM_DEADLINE_DEFAULT", "30"))
+
+
+class UpstreamUnavailable(Exception):
+    """Raised when the circuit breaker is open or the deadline is exhausted."""
+
+
+class RetryBudget:
+    """Token bucket that caps retries to a fraction of overall traffic."""
+
+    def __init__(self, ratio=RETRY_BUDGET_RATIO, min_per_second=RETRY_BUDGET_MIN_PER_SECOND,
+                 max_tokens=10):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self.denied = 0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.max_tokens, self.tokens + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+    def deposit(self):
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            self.denied += 1
+            return False
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_seconds=BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._lock = threading.Lock()
+
+    def is_closed(self):
+        """Return True if a call would currently be let through."""
+        if self.state == self.CLOSED:
+            return True
+        return self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_seconds
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_neutral(self):
+        """Record a call that says nothing about upstream health, such as a rejected request.
+
+        A half-open probe that ends this way is given back, so the next
+        call probes again.
+        """
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+retry_budget = RetryBudget()
+breaker = CircuitBreaker()
+
+_client = None
+_client_lock = threading.Lock()
+_counters = {"calls": 0, "retries": 0, "failures": 0, "short_circuited": 0}
+_counters_lock = threading.Lock()
+
+
+def _count(name):
+    with _counters_lock:
+        _counters[name] += 1
+
+
+def is_configured():
+    """Return True if an API key is available."""
+    return bool(api_key)
+
+
+def is_available():
+    """Return True if calls should be attempted instead of using a fallback."""
+    return is_configured() and breaker.is_closed()
+
+
+def get_client():
+    """Return the shared OpenAI client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import OpenAI, DefaultHttpxClient
+
+                httpx = _httpx()
+                http_client = None
+                if httpx is not None:
+                    http_client = DefaultHttpxClient(limits=httpx.Limits(
+                        max_connections=MAX_CONNECTIONS,
+                        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                    ))
+                _client = OpenAI(api_key=api_key, max_retries=0, http_client=http_client)
+    return _client
+
+
+def _httpx():
+    try:
+        import httpx
+    except ImportError:
+        return None
+    return httpx
+
+
+def _timeout(seconds):
+    httpx = _httpx()
+    if httpx is None:
+        return seconds
+    return httpx.Timeout(seconds, connect=min(CONNECT_TIMEOUT, seconds))
+
+
+def _is_retryable(error):
+    import openai
+
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError,
+                          openai.RateLimitError, openai.InternalServerError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+def _backoff(attempt):
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt)))
+
+
+def chat_completion(operation, **kwargs):
+    """Call chat.completions.create under the operation's deadline, retry and breaker policy."""
+    if not is_configured():
+        raise UpstreamUnavailable("OpenAI API key is not configured")
+    if not breaker.allow():
+        _count("short_circuited")
+        raise UpstreamUnavailable("Circuit breaker is open")
+
+    _count("calls")
+    retry_budget.deposit()
+    deadline = time.monotonic() + OPERATION_DEADLINES.get(operation, DEFAULT_DEADLINE)
+    attempt = 0
+
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            _count("failures")
+            breaker.record_failure()
+            raise UpstreamUnavailable(f"Deadline exceeded for {operation}")
+
+        try:
+            with stage(f"llm.{operation}"):
+                response = get_client().with_options(timeout=_timeout(remaining)).chat.completions.create(**kwargs)
+        except Exception as e:
+            if not _is_retryable(e):
+                breaker.record_neutral()
+                raise
+            delay = _backoff(attempt)
+            if (attempt >= MAX_RETRIES or delay >= deadline - time.monotonic()
+                    or not retry_budget.withdraw()):
+                _count("failures")
+                breaker.record_failure()
+                raise
+            attempt += 1
+            _count("retries")
+            time.sleep(delay)
+            continue
+
+        if kwargs.get("stream"):
+            return _guarded_stream(operation, response, deadline)
+        breaker.record_success()
+        record_usage(operation, getattr(response, "usage", None))
+        return response
+
+
+def _guarded_stream(operation, stream, deadline):
+    """Yield a streamed reply's chunks, holding the read to the deadline and reporting it to the breaker."""
+    outcome = None
+    try:
+        for chunk in stream:
+            if time.monotonic() > deadline:
+                outcome = "failure"
+                raise UpstreamUnavailable(f"Deadline exceeded for {operation}")
+            yield chunk
+        outcome = "success"
+    except Exception as e:
+        if outcome is None and _is_retryable(e):
+            outcome = "failure"
+        raise
+    finally:
+        stream.close()
+        if outcome == "success":
+            breaker.record_success()
+        elif outcome == "failure":
+            _count("failures")
+            breaker.record_failure()
+        else:
+            # Rejected mid-stream, or the reader stopped early.
+            breaker.record_neutral()
+
+
+def get_client_stats():
+    """Get call, retry and circuit breaker counters for the upstream client."""
+    with _counters_lock:
+        stats = dict(_counters)
+    stats["retries_denied"] = retry_budget.denied
+    stats["breaker_state"] = breaker.state
+    stats["breaker_opened"] = breaker.times_opened
+    return stats
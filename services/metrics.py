@@ -0,0 +1,246 @@
+import os
+import time
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1").lower() not in ("0", "false", "no")
+# "off": never send Server-Timing; "request": only when the request sends X-Server-Timing; "always".
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "request").lower()
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_trace = contextvars.ContextVar("metrics_trace", default=None)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter keyed by a fixed tuple of label values."""
+
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        with self._lock:
+            return self._values.get(label_values, 0)
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            yield self.name, _format_labels(self.labels, label_values), value
+
+
+class Histogram:
+    """Cumulative-bucket histogram of durations, in seconds."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, *label_values):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def count(self, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            return series[2] if series else 0
+
+    def samples(self):
+        with self._lock:
+            snapshot = sorted((key, (list(s[0]), s[1], s[2])) for key, s in self._series.items())
+        for label_values, (counts, total, count) in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labels, label_values, [("le", _format_value(float(bound)))])
+                yield f"{self.name}_bucket", labels, cumulative
+            labels = _format_labels(self.labels, label_values)
+            yield f"{self.name}_sum", labels, round(total, 6)
+            yield f"{self.name}_count", labels, count
+
+
+class Registry:
+    """Process-wide set of metrics rendered in the Prometheus text format.
+
+    Collectors are callables returning ``(name, help, value)`` gauges that
+    are read at scrape time, for counters other services already keep.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help, labels=()):
+        metric = Counter(name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        for collector in self._collectors:
+            try:
+                gauges = list(collector())
+            except Exception as e:
+                continue
+            for name, help, value in gauges:
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+request_seconds = registry.histogram(
+    "studypal_request_duration_seconds", "Time to build each response, by endpoint.",
+    ("endpoint", "method", "status"))
+stage_seconds = registry.histogram(
+    "studypal_stage_duration_seconds", "Time spent in each processing stage.", ("stage",))
+llm_tokens = registry.counter(
+    "studypal_llm_tokens_total", "OpenAI tokens used, by operation and kind.", ("operation", "kind"))
+fallbacks = registry.counter(
+    "studypal_fallbacks_total", "Responses built without the model, by generator and reason.",
+    ("generator", "reason"))
+continuations = registry.counter(
+    "studypal_llm_continuations_total", "Follow-up requests for the part of a reply that was cut off.",
+    ("operation",))
+
+
+@contextmanager
+def stage(name):
+    """Time a block as one processing stage."""
+    if not METRICS_ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - start)
+
+
+def observe_stage(name, seconds):
+    """Record a stage duration measured by the caller."""
+    if not METRICS_ENABLED:
+        return
+    stage_seconds.observe(seconds, name)
+    trace = _trace.get()
+    if trace is not None:
+        trace[name] = trace.get(name, 0.0) + seconds
+
+
+def record_usage(operation, usage):
+    """Count the prompt and completion tokens reported by an API response."""
+    if usage is None or not METRICS_ENABLED:
+        return
+    for kind in ("prompt", "completion"):
+        tokens = getattr(usage, f"{kind}_tokens", None)
+        if tokens:
+            llm_tokens.inc(operation, kind, amount=tokens)
+
+
+def record_fallback(generator, reason):
+    """Count a response served by a fallback generator instead of the model."""
+    if METRICS_ENABLED:
+        fallbacks.inc(generator, reason)
+
+
+def record_continuation(operation):
+    """Count a follow-up request for the missing part of an incomplete reply."""
+    if METRICS_ENABLED:
+        continuations.inc(operation)
+
+
+def record_request(endpoint, method, status, seconds):
+    """Record how long a route took to produce its response."""
+    if METRICS_ENABLED:
+        request_seconds.observe(seconds, endpoint, method, str(status))
+
+
+def start_trace():
+    """Start collecting stage timings for the current request."""
+    _trace.set({})
+
+
+def end_trace():
+    """Stop collecting and return ``{stage: seconds}`` for the request, or None if none was started."""
+    trace = _trace.get()
+    _trace.set(None)
+    return trace
+
+
+def server_timing(trace, total=None):
+    """Format stage timings as a Server-Timing header value."""
+    parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in trace.items()]
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def gauges(prefix, stats, help):
+    """Turn the numeric values of a stats dict into ``(name, help, value)`` gauges."""
+    for key, value in stats.items():
+        if isinstance(value, bool):
+            value = int(value)
+        if isinstance(value, (int, float)):
+            yield f"{prefix}_{key}", f"{help} ({key}).", value
+
+
+def render_metrics():
+    """Render every metric in the Prometheus text exposition format."""
+    return registry.render()
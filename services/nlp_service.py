@@ -1,149 +1,291 @@
-import nltk
-from nltk.tokenize import word_tokenize, sent_tokenize
-from nltk.corpus import stopwords
-from nltk.probability import FreqDist
+import re
+import math
 import string
 import os
+import threading
+from collections import Counter
+from functools import lru_cache
+
+from services.metrics import stage
 
 nltk_data_path = os.path.join(os.path.dirname(__file__), '..', 'nltk_data')
-if not os.path.exists(nltk_data_path):
-    os.makedirs(nltk_data_path)
-nltk.data.path.append(nltk_data_path)
 
-def ensure_nltk_data():
-    """Download required NLTK data if not present."""
-    try:
-        nltk.data.find('tokenizers/punkt')
-    except LookupError:
-        nltk.download('punkt', download_dir=nltk_data_path, quiet=True)
-    
-    try:
-        nltk.data.find('tokenizers/punkt_tab')
-    except LookupError:
-        nltk.download('punkt_tab', download_dir=nltk_data_path, quiet=True)
-    
+FALLBACK_STOPWORDS = frozenset({
+    'the', 'a', 'an', 'is', 'are', 'was', 'were', 'be', 'been',
+    'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will',
+    'would', 'could', 'should', 'may', 'might', 'must', 'shall',
+    'can', 'need', 'dare', 'ought', 'used', 'to', 'of', 'in',
+    'for', 'on', 'with', 'at', 'by', 'from', 'as', 'into',
+    'through', 'during', 'before', 'after', 'above', 'below',
+    'between', 'under', 'again', 'further', 'then', 'once',
+    'and', 'but', 'or', 'nor', 'so', 'yet', 'both', 'either',
+    'neither', 'not', 'only', 'own', 'same', 'than', 'too',
+    'very', 'just', 'also', 'now', 'here', 'there', 'when',
+    'where', 'why', 'how', 'all', 'each', 'every', 'both',
+    'few', 'more', 'most', 'other', 'some', 'such', 'no',
+    'any', 'this', 'that', 'these', 'those', 'it', 'its'
+})
+
+DEFAULT_KEYWORDS = ["study", "learn", "practice", "review", "understand"]
+
+TIP_TEMPLATES = [
+    "Focus on understanding {keyword} concepts thoroughly before moving on.",
+    "Create flashcards for {keyword} terminology to improve retention.",
+    "Practice {keyword} problems daily to build confidence.",
+    "Connect {keyword} to real-world examples for better understanding.",
+    "Review {keyword} notes within 24 hours of learning.",
+    "Teach {keyword} concepts to someone else to deepen your understanding.",
+    "Use diagrams and visual aids when studying {keyword}.",
+    "Break down complex {keyword} topics into smaller, manageable parts.",
+    "Set specific goals for mastering {keyword} each week.",
+    "Take short breaks while studying {keyword} to maintain focus."
+]
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+|\n\s*\n')
+
+_nltk_checked = False
+_nltk_lock = threading.Lock()
+_tokenizer_available = False
+
+
+def _nltk():
+    """Import nltk on first use and register the local data directory."""
+    import nltk
+
+    if nltk_data_path not in nltk.data.path:
+        nltk.data.path.append(nltk_data_path)
+    return nltk
+
+
+def _download(nltk, package):
+    os.makedirs(nltk_data_path, exist_ok=True)
+    nltk.download(package, download_dir=nltk_data_path, quiet=True)
+
+
+def _has_resource(nltk, resource):
     try:
-        nltk.data.find('corpora/stopwords')
+        nltk.data.find(resource)
+        return True
     except LookupError:
-        nltk.download('stopwords', download_dir=nltk_data_path, quiet=True)
+        return False
 
 
-def extract_keywords(text, num_keywords=5):
-    """Extract top keywords from text using NLTK tokenization."""
+def ensure_nltk_data():
+    """Download required NLTK data if not present. Runs once per process."""
+    global _nltk_checked, _tokenizer_available
+    if _nltk_checked:
+        return
+
+    with _nltk_lock:
+        if _nltk_checked:
+            return
+        nltk = _nltk()
+
+        for resource, package in (('tokenizers/punkt', 'punkt'),
+                                  ('tokenizers/punkt_tab', 'punkt_tab'),
+                                  ('corpora/stopwords', 'stopwords')):
+            if not _has_resource(nltk, resource):
+                _download(nltk, package)
+
+        _tokenizer_available = _has_resource(nltk, 'tokenizers/punkt_tab')
+        _nltk_checked = True
+
+
+@lru_cache(maxsize=1)
+def get_stopwords():
+    """Return the English stopword set, loaded once."""
     ensure_nltk_data()
-    
-    try:
-        tokens = word_tokenize(text.lower())
-    except Exception:
-        tokens = text.lower().split()
-    
     try:
-        stop_words = set(stopwords.words('english'))
+        from nltk.corpus import stopwords
+        return frozenset(stopwords.words('english'))
     except Exception:
-        stop_words = {'the', 'a', 'an', 'is', 'are', 'was', 'were', 'be', 'been', 
-                      'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will',
-                      'would', 'could', 'should', 'may', 'might', 'must', 'shall',
-                      'can', 'need', 'dare', 'ought', 'used', 'to', 'of', 'in',
-                      'for', 'on', 'with', 'at', 'by', 'from', 'as', 'into',
-                      'through', 'during', 'before', 'after', 'above', 'below',
-                      'between', 'under', 'again', 'further', 'then', 'once',
-                      'and', 'but', 'or', 'nor', 'so', 'yet', 'both', 'either',
-                      'neither', 'not', 'only', 'own', 'same', 'than', 'too',
-                      'very', 'just', 'also', 'now', 'here', 'there', 'when',
-                      'where', 'why', 'how', 'all', 'each', 'every', 'both',
-                      'few', 'more', 'most', 'other', 'some', 'such', 'no',
-                      'any', 'this', 'that', 'these', 'those', 'it', 'its'}
-    
-    filtered_tokens = [
-        token for token in tokens 
-        if token not in stop_words 
-        and token not in string.punctuation
-        and len(token) > 2
-        and token.isalpha()
-    ]
-    
-    if not filtered_tokens:
-        return ["study", "learn", "practice", "review", "understand"]
-    
-    freq_dist = FreqDist(filtered_tokens)
-    
-    keywords = [word for word, freq in freq_dist.most_common(num_keywords)]
-    
-    return keywords if keywords else ["study", "learn", "practice"]
+        return FALLBACK_STOPWORDS
+
+
+def _tokenize(text):
+    """Split text into sentences and word tokens in a single pass."""
+    ensure_nltk_data()
+
+    if _tokenizer_available:
+        try:
+            from nltk.tokenize import word_tokenize, sent_tokenize
+            sentences = sent_tokenize(text)
+            words = [word for sentence in sentences
+                     for word in word_tokenize(sentence, preserve_line=True)]
+            return sentences, words
+        except Exception:
+            pass
+
+    return text.split('.'), text.split()
+
+
+class TextAnalysis:
+    """One tokenization of a document shared by keywords, tips and complexity metrics."""
+
+    def __init__(self, text):
+        self.text = text
+        with stage("nlp.tokenize"):
+            self.sentences, self.words = _tokenize(text)
+        self._content_words = None
+        self._keywords = None
+
+    @property
+    def content_words(self):
+        """Lowercased tokens with stopwords, punctuation and short words removed."""
+        if self._content_words is None:
+            stop_words = get_stopwords()
+            lowered = (word.lower() for word in self.words)
+            self._content_words = [
+                token for token in lowered
+                if token not in stop_words
+                and token not in string.punctuation
+                and len(token) > 2
+                and token.isalpha()
+            ]
+        return self._content_words
+
+    def keywords(self, num_keywords=5):
+        """Return the content words with the highest TF-IDF weight."""
+        if self._keywords is not None and len(self._keywords) >= num_keywords:
+            return self._keywords[:num_keywords]
+
+        if not self.content_words:
+            return list(DEFAULT_KEYWORDS)
+
+        from services.keyword_engine import get_keyword_engine
+
+        with stage("nlp.keywords"):
+            engine = get_keyword_engine()
+            if engine is not None:
+                keywords = engine.top_keywords([self.content_words], num_keywords)[0]
+            else:
+                keywords = [word for word, freq in Counter(self.content_words).most_common(num_keywords)]
+
+        return keywords if keywords else ["study", "learn", "practice"]
+
+    def study_tips(self, subject="general"):
+        """Build study tips around the document's keywords."""
+        keywords = self.keywords()
+
+        tips = []
+        for i, keyword in enumerate(keywords[:5]):
+            template = TIP_TEMPLATES[i % len(TIP_TEMPLATES)]
+            tips.append(template.format(keyword=keyword))
+
+        general_tips = [
+            f"Allocate dedicated study time for {subject} each day.",
+            "Use active recall techniques instead of passive reading.",
+            "Get enough sleep to help consolidate what you've learned.",
+            "Stay hydrated and take regular breaks during study sessions.",
+            "Review material multiple times using spaced repetition."
+        ]
+
+        while len(tips) < 5:
+            tips.append(general_tips[len(tips) % len(general_tips)])
+
+        return {
+            "keywords": keywords,
+            "tips": tips,
+            "subject": subject
+        }
+
+    def complexity(self):
+        """Compute sentence and word length metrics and a suggested difficulty."""
+        num_sentences = len(self.sentences)
+        num_words = len(self.words)
+        avg_sentence_length = num_words / max(num_sentences, 1)
+
+        long_words = [w for w in self.words if len(w) > 6]
+        long_word_ratio = len(long_words) / max(num_words, 1)
+
+        if avg_sentence_length > 20 or long_word_ratio > 0.3:
+            difficulty = "hard"
+        elif avg_sentence_length > 12 or long_word_ratio > 0.2:
+            difficulty = "medium"
+        else:
+            difficulty = "easy"
+
+        return {
+            "num_sentences": num_sentences,
+            "num_words": num_words,
+            "avg_sentence_length": round(avg_sentence_length, 2),
+            "long_word_ratio": round(long_word_ratio, 2),
+            "suggested_difficulty": difficulty
+        }
+
+
+def estimate_tokens(text):
+    """Roughly estimate the model token count of a text (about four characters per token)."""
+    return math.ceil(len(text) / 4)
+
+
+def split_sentences(text):
+    """Split text on sentence boundaries without loading NLTK."""
+    return [sentence.strip() for sentence in SENTENCE_BOUNDARY.split(text) if sentence and sentence.strip()]
+
+
+def chunk_text(text, max_tokens):
+    """Group consecutive sentences into chunks of at most ``max_tokens`` estimated tokens.
+
+    Sentences longer than the budget on their own are split on word boundaries.
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+
+    for sentence in split_sentences(text):
+        pieces = [sentence]
+        if estimate_tokens(sentence) > max_tokens:
+            words = sentence.split()
+            pieces, piece = [], []
+            for word in words:
+                if piece and estimate_tokens(" ".join(piece + [word])) > max_tokens:
+                    pieces.append(" ".join(piece))
+                    piece = []
+                piece.append(word)
+            if piece:
+                pieces.append(" ".join(piece))
+
+        for piece in pieces:
+            tokens = estimate_tokens(piece) + 1
+            if current and current_tokens + tokens > max_tokens:
+                chunks.append(" ".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += tokens
+
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def analyze_document(text):
+    """Tokenize a document once for all downstream analyses."""
+    return TextAnalysis(text)
+
+
+def analyze_documents_keywords(analyses, num_keywords=5):
+    """Score the keywords of many analyzed documents in one matrix operation."""
+    from services.keyword_engine import get_keyword_engine
+
+    engine = get_keyword_engine()
+    scored = [analysis for analysis in analyses if analysis.content_words]
+    if engine is None or not scored:
+        return
+    for analysis, keywords in zip(scored, engine.top_keywords([a.content_words for a in scored], num_keywords)):
+        analysis._keywords = keywords
+
+
+def extract_keywords(text, num_keywords=5):
+    """Extract top keywords from text using NLTK tokenization."""
+    return analyze_document(text).keywords(num_keywords)
 
 
 def generate_study_tips(text, subject="general"):
     """Generate study tips based on extracted keywords."""
-    keywords = extract_keywords(text)
-    
-    tip_templates = [
-        "Focus on understanding {keyword} concepts thoroughly before moving on.",
-        "Create flashcards for {keyword} terminology to improve retention.",
-        "Practice {keyword} problems daily to build confidence.",
-        "Connect {keyword} to real-world examples for better understanding.",
-        "Review {keyword} notes within 24 hours of learning.",
-        "Teach {keyword} concepts to someone else to deepen your understanding.",
-        "Use diagrams and visual aids when studying {keyword}.",
-        "Break down complex {keyword} topics into smaller, manageable parts.",
-        "Set specific goals for mastering {keyword} each week.",
-        "Take short breaks while studying {keyword} to maintain focus."
-    ]
-    
-    tips = []
-    for i, keyword in enumerate(keywords[:5]):
-        template = tip_templates[i % len(tip_templates)]
-        tips.append(template.format(keyword=keyword))
-    
-    general_tips = [
-        f"Allocate dedicated study time for {subject} each day.",
-        "Use active recall techniques instead of passive reading.",
-        "Get enough sleep to help consolidate what you've learned.",
-        "Stay hydrated and take regular breaks during study sessions.",
-        "Review material multiple times using spaced repetition."
-    ]
-    
-    while len(tips) < 5:
-        tips.append(general_tips[len(tips) % len(general_tips)])
-    
-    return {
-        "keywords": keywords,
-        "tips": tips,
-        "subject": subject
-    }
+    return analyze_document(text).study_tips(subject)
 
 
 def analyze_text_complexity(text):
     """Analyze text complexity for quiz difficulty classification."""
-    ensure_nltk_data()
-    
-    try:
-        sentences = sent_tokenize(text)
-    except Exception:
-        sentences = text.split('.')
-    
-    try:
-        words = word_tokenize(text)
-    except Exception:
-        words = text.split()
-    
-    num_sentences = len(sentences)
-    num_words = len(words)
-    avg_sentence_length = num_words / max(num_sentences, 1)
-    
-    long_words = [w for w in words if len(w) > 6]
-    long_word_ratio = len(long_words) / max(num_words, 1)
-    
-    if avg_sentence_length > 20 or long_word_ratio > 0.3:
-        difficulty = "hard"
-    elif avg_sentence_length > 12 or long_word_ratio > 0.2:
-        difficulty = "medium"
-    else:
-        difficulty = "easy"
-    
-    return {
-        "num_sentences": num_sentences,
-        "num_words": num_words,
-        "avg_sentence_length": round(avg_sentence_length, 2),
-        "long_word_ratio": round(long_word_ratio, 2),
-        "suggested_difficulty": difficulty
-    }
+    return analyze_document(text).complexity()
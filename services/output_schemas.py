@@ -0,0 +1,156 @@
+import os
+
+from services.json_parsing import parse_json_lenient, salvage_array
+from services.question_bank import validate_question
+
+# "json_schema" asks for structured output, "json_object" for plain JSON mode,
+# "none" sends no response_format (for compatible servers that reject it).
+LLM_RESPONSE_FORMAT = os.environ.get("LLM_RESPONSE_FORMAT", "json_schema").lower()
+
+
+def _object(properties):
+    """A strict-mode object schema: every property required, nothing else allowed."""
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False
+    }
+
+
+STRING = {"type": "string"}
+STRINGS = {"type": "array", "items": STRING}
+
+DAY = _object({
+    "day": {"type": "integer"},
+    "focus_topic": STRING,
+    "activities": {"type": "array", "items": _object({"time": STRING, "activity": STRING})},
+    "goals": STRINGS
+})
+
+QUESTION = _object({
+    "id": {"type": "integer"},
+    "question": STRING,
+    "options": STRINGS,
+    "correct_answer": {"type": "string", "enum": ["A", "B", "C", "D"]},
+    "explanation": STRING
+})
+
+SCHEMAS = {
+    "study_plan": _object({
+        "plan_title": STRING,
+        "total_days": {"type": "integer"},
+        "hours_per_day": {"type": "number"},
+        "daily_schedule": {"type": "array", "items": DAY},
+        "weekly_goals": STRINGS
+    }),
+    "study_plan_days": _object({"daily_schedule": {"type": "array", "items": DAY}}),
+    "quiz": _object({
+        "quiz_title": STRING,
+        "difficulty": STRING,
+        "questions": {"type": "array", "items": QUESTION}
+    }),
+    "summary": _object({"summary": STRING, "key_points": STRINGS, "word_count": {"type": "integer"}}),
+    "feedback": _object({"message": STRING, "tip": STRING, "emoji": STRING}),
+}
+
+
+def response_format(name):
+    """Return the ``response_format`` argument for a generator's schema, or {} when disabled."""
+    if LLM_RESPONSE_FORMAT == "json_schema":
+        return {"response_format": {
+            "type": "json_schema",
+            "json_schema": {"name": name, "schema": SCHEMAS[name], "strict": True}
+        }}
+    if LLM_RESPONSE_FORMAT == "json_object":
+        return {"response_format": {"type": "json_object"}}
+    return {}
+
+
+def _text(value):
+    return value.strip() if isinstance(value, str) else ""
+
+
+def _texts(values):
+    if not isinstance(values, list):
+        return []
+    return [text for text in (_text(value) for value in values) if text]
+
+
+def clean_day(day):
+    """Return a cleaned schedule day, or None if it is unusable."""
+    if not isinstance(day, dict):
+        return None
+    activities = []
+    for activity in day.get("activities") if isinstance(day.get("activities"), list) else []:
+        if isinstance(activity, dict) and _text(activity.get("time")) and _text(activity.get("activity")):
+            activities.append({"time": _text(activity["time"]), "activity": _text(activity["activity"])})
+    focus = _text(day.get("focus_topic"))
+    if not focus or not activities:
+        return None
+    return {"day": day.get("day"), "focus_topic": focus, "activities": activities, "goals": _texts(day.get("goals"))}
+
+
+def parse_days(content):
+    """Return the valid days of a (possibly truncated or malformed) reply, numbered from 1.
+
+    In a truncated reply only fully closed days count; the repaired
+    document is still returned for its top-level fields.
+    """
+    data, complete = parse_json_lenient(content)
+    raw_days = data.get("daily_schedule") if isinstance(data, dict) else None
+    if not isinstance(raw_days, list) or not complete:
+        # The repaired document keeps the day that was cut off; only take closed ones.
+        raw_days = salvage_array(content, "daily_schedule")
+    days = [day for day in (clean_day(raw) for raw in raw_days) if day]
+    for number, day in enumerate(days, start=1):
+        day["day"] = number
+    return data if isinstance(data, dict) else {}, days
+
+
+def parse_study_plan(content, subject, hours_per_day, days):
+    """Parse a study plan reply, keeping every valid day. ``daily_schedule`` may come back short."""
+    data, schedule = parse_days(content)
+    return {
+        "plan_title": _text(data.get("plan_title")) or f"Study Plan for {subject}",
+        "total_days": days,
+        "hours_per_day": hours_per_day,
+        "daily_schedule": schedule[:days],
+        "weekly_goals": _texts(data.get("weekly_goals"))
+    }
+
+
+def parse_questions(content):
+    """Return the valid questions of a quiz reply, leaving out one cut off mid-way."""
+    data, complete = parse_json_lenient(content)
+    raw = data.get("questions") if isinstance(data, dict) else None
+    if not isinstance(raw, list) or not complete:
+        raw = salvage_array(content, "questions")
+    return [question for question in (validate_question(q) for q in raw) if question]
+
+
+def parse_summary(content):
+    """Parse a summary reply. Raises ValueError if it has no summary text."""
+    data, complete = parse_json_lenient(content)
+    data = data if isinstance(data, dict) else {}
+    summary = _text(data.get("summary"))
+    key_points = _texts(data.get("key_points"))
+    if not summary:
+        if not key_points:
+            raise ValueError("Summary reply has no summary")
+        summary = " ".join(key_points)
+    return {"summary": summary, "key_points": key_points, "word_count": len(summary.split())}
+
+
+def parse_feedback(content):
+    """Parse a feedback reply. Raises ValueError if it has no message."""
+    data, complete = parse_json_lenient(content)
+    data = data if isinstance(data, dict) else {}
+    message = _text(data.get("message"))
+    if not message:
+        raise ValueError("Feedback reply has no message")
+    return {
+        "message": message,
+        "tip": _text(data.get("tip")) or "Review your notes regularly for better retention.",
+        "emoji": _text(data.get("emoji")) or "star"
+    }
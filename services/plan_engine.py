@@ -0,0 +1,264 @@
+import os
+import time
+import threading
+
+from services.artifact_store import artifact_store
+from services.data_service import get_topics_for_subject
+from services.metrics import record_fallback
+from services.task_queue import plan_tasks
+
+PLAN_START_HOUR = float(os.environ.get("PLAN_START_HOUR", "9"))
+PLAN_STREAM_GRACE_SECONDS = float(os.environ.get("PLAN_STREAM_GRACE_SECONDS", "120"))
+
+STUDY_BLOCK_MINUTES = 60
+BREAK_MINUTES = 15
+MIN_HOURS, MAX_HOURS = 0.25, 16
+MAX_DAYS = 366
+LATEST_END_MINUTES = 23 * 60
+
+ACTIVITIES = {
+    "learn": ["Learn the key ideas of {topic}", "Work through examples on {topic}",
+              "Summarize {topic} in your own notes"],
+    "practice": ["Practice problems on {topic}", "Check your answers and correct mistakes on {topic}",
+                 "Quiz yourself on {topic}"],
+    "review": ["Review your notes on {topic}", "Recall {topic} from memory, then check",
+               "Flashcards and spaced repetition for {topic}"],
+}
+GOALS = {
+    "learn": ["Explain the key ideas of {topic}", "Complete the {topic} examples", "Take notes"],
+    "practice": ["Solve {topic} problems without notes", "List the mistakes to revisit"],
+    "review": ["Recall the main points of {topic}", "Identify any remaining weak spots"],
+}
+SCENARIO_GOALS = {
+    "exam preparation": "Sit a timed mock exam before the last day",
+    "homework help": "Finish each assignment with worked solutions",
+    "new topic learning": "Be able to teach each topic to someone else",
+    "revision": "Recall every topic without looking at notes",
+    "project work": "Apply each topic in your project",
+}
+
+
+def normalize_hours(value):
+    """Parse study hours per day, rounded to a quarter hour and clamped to a sane range."""
+    try:
+        hours = float(value)
+    except (TypeError, ValueError):
+        hours = 2.0
+    hours = float(min(MAX_HOURS, max(MIN_HOURS, round(hours * 4) / 4)))
+    return int(hours) if hours.is_integer() else hours
+
+
+def format_clock(minutes):
+    """Format minutes after midnight as a 12-hour time, e.g. ``12:15 PM``."""
+    hour, minute = divmod(int(minutes) % (24 * 60), 60)
+    suffix = "AM" if hour < 12 else "PM"
+    return f"{hour % 12 or 12}:{minute:02d} {suffix}"
+
+
+def time_blocks(hours_per_day, start_hour=PLAN_START_HOUR):
+    """Split a day's study time into blocks separated by short breaks.
+
+    Returns ``(start, end, is_break)`` tuples in minutes after midnight.
+    Long days start earlier so the last block still ends by 11 PM.
+    """
+    remaining = round(hours_per_day * 60)
+    study_blocks = -(-remaining // STUDY_BLOCK_MINUTES)
+    span = remaining + max(0, study_blocks - 1) * BREAK_MINUTES
+    start = max(0, min(round(start_hour * 60), LATEST_END_MINUTES - span))
+
+    blocks = []
+    while remaining > 0:
+        length = min(STUDY_BLOCK_MINUTES, remaining)
+        blocks.append((start, start + length, False))
+        start += length
+        remaining -= length
+        if remaining > 0:
+            blocks.append((start, start + BREAK_MINUTES, True))
+            start += BREAK_MINUTES
+    return blocks
+
+
+def assign_days(topics, days, scenario=""):
+    """Decide each day's topics and phase: learn, practice or review.
+
+    Returns ``(topics, phase, final)`` per day. Every topic gets a day of
+    its own when there is room, extra days are spent practising, and the
+    last day reviews everything once all topics are covered.
+    """
+    revision = scenario.strip().lower() == "revision"
+    first_phase = "review" if revision else "learn"
+    final_review = days > len(topics)
+    teaching_days = days - 1 if final_review else days
+
+    schedule = []
+    if teaching_days >= len(topics):
+        schedule.extend(([topic], first_phase, False) for topic in topics)
+        for i in range(teaching_days - len(topics)):
+            schedule.append(([topics[i % len(topics)]], "review" if revision else "practice", False))
+    else:
+        # Fewer days than topics: cover consecutive topics together.
+        for i in range(teaching_days):
+            group = topics[i * len(topics) // teaching_days:(i + 1) * len(topics) // teaching_days]
+            schedule.append((group, first_phase, False))
+    if final_review:
+        schedule.append((list(topics), "review", True))
+    return schedule
+
+
+def build_day(number, day_topics, phase, hours_per_day, final=False):
+    """Build one day of the schedule."""
+    focus = "Final Review" if final else " & ".join(day_topics)
+    templates = ACTIVITIES[phase]
+    activities = []
+    study_index = 0
+    for start, end, is_break in time_blocks(hours_per_day):
+        if is_break:
+            activity = "Short break"
+        else:
+            topic = day_topics[study_index % len(day_topics)]
+            activity = templates[study_index % len(templates)].format(topic=topic)
+            study_index += 1
+        activities.append({"time": f"{format_clock(start)} - {format_clock(end)}", "activity": activity})
+
+    goal_topic = "all topics" if final else " and ".join(day_topics)
+    return {
+        "day": number,
+        "focus_topic": focus,
+        "activities": activities,
+        "goals": [goal.format(topic=goal_topic) for goal in GOALS[phase]]
+    }
+
+
+def build_study_plan(subject, hours_per_day, scenario, days, topics=None):
+    """Build a deterministic study plan from the subject's catalog topics.
+
+    The plan has the same shape as the model's plans, so it can be shown
+    at once and replaced when the model's plan is ready.
+    """
+    hours_per_day = normalize_hours(hours_per_day)
+    days = min(MAX_DAYS, max(1, int(days)))
+    topics = [topic.title() for topic in (topics or get_topics_for_subject(subject))] or [subject]
+
+    daily_schedule = [
+        build_day(i + 1, day_topics, phase, hours_per_day, final)
+        for i, (day_topics, phase, final) in enumerate(assign_days(topics, days, scenario))
+    ]
+
+    weekly_goals = [f"Cover all {len(topics)} {subject} topics: {', '.join(topics)}"]
+    weekly_goals.append(SCENARIO_GOALS.get(scenario.strip().lower(), "Complete all practice problems"))
+    weekly_goals.append(f"Be prepared for {scenario}")
+    return {
+        "plan_title": f"Study Plan for {subject}",
+        "total_days": days,
+        "hours_per_day": hours_per_day,
+        "daily_schedule": daily_schedule,
+        "weekly_goals": weekly_goals
+    }
+
+
+class PlanRefiner:
+    """Replaces stored local plans with the model's plans.
+
+    The local plan is stored as a pending artifact so no worker caches it
+    in memory; once the model answers (or fails), the final plan is
+    written under the same ID and readers in every worker see it. Queued
+    refinements run on the plan refinement queue, and when it is full the
+    local plan is made final at once. A plan meant to be streamed keeps
+    the local plan if its stream closes early, or if no stream in this
+    process has started within ``stream_grace_seconds``. When the queue
+    shuts down, every plan in this process that has not stored its final
+    plan keeps the local one, so no plan stays pending.
+    """
+
+    def __init__(self, store, tasks, stream_grace_seconds=PLAN_STREAM_GRACE_SECONDS):
+        self.store = store
+        self.tasks = tasks
+        self.stream_grace_seconds = stream_grace_seconds
+        self._unfinished = {}
+        self._lock = threading.Lock()
+        tasks.on_drain(self.keep_unfinished)
+
+    def _track(self, plan_id, request, expires_at=None):
+        """Remember an unfinished plan, and make the local plan final for expired ones."""
+        now = time.monotonic()
+        with self._lock:
+            self._unfinished[plan_id] = (request, expires_at)
+            expired = [other for other, (_, other_expires) in self._unfinished.items()
+                       if other_expires is not None and other_expires < now]
+            expired = {other: self._unfinished.pop(other)[0] for other in expired}
+        for other, other_request in expired.items():
+            self.keep_local(other, *other_request)
+
+    def submit(self, plan_id, subject, hours_per_day, scenario, days):
+        """Queue a refinement of the plan stored under ``plan_id``. Returns False if the local plan was kept."""
+        request = (subject, hours_per_day, scenario, days)
+        self._track(plan_id, request)
+        if self.tasks.offer(self.refine, plan_id, *request):
+            return True
+        if self._finish(plan_id):
+            self.keep_local(plan_id, *request)
+        return False
+
+    def expect_stream(self, plan_id, subject, hours_per_day, scenario, days):
+        """Note that the page will stream the plan; the local plan is kept if no stream starts in time."""
+        request = (subject, hours_per_day, scenario, days)
+        self._track(plan_id, request, time.monotonic() + self.stream_grace_seconds)
+
+    def start_stream(self, plan_id, subject, hours_per_day, scenario, days):
+        """Note that a stream of the plan has started; it must end in ``store_streamed`` or ``stream_closed``."""
+        self._track(plan_id, (subject, hours_per_day, scenario, days))
+
+    def store_streamed(self, plan_id, plan):
+        """Store a streamed plan unless the plan is already final. Returns the plan that is final."""
+        if self._finish(plan_id) and self.store.is_pending(plan_id):
+            self.store.put('plan', plan, plan_id)
+            return plan
+        return self.store.get('plan', plan_id) or plan
+
+    def stream_closed(self, plan_id):
+        """Keep the local plan when a stream ends before storing the final plan."""
+        request = self._finish(plan_id)
+        if request and self.store.is_pending(plan_id):
+            self.keep_local(plan_id, *request)
+
+    def _finish(self, plan_id):
+        """Claim the right to store the final plan. Returns its request, or None if it was already claimed."""
+        with self._lock:
+            entry = self._unfinished.pop(plan_id, None)
+        return entry[0] if entry is not None else None
+
+    def keep_local(self, plan_id, subject, hours_per_day, scenario, days):
+        """Make the stored local plan final."""
+        plan = self.store.get('plan', plan_id) or build_study_plan(subject, hours_per_day, scenario, days)
+        self.store.put('plan', plan, plan_id)
+
+    def keep_unfinished(self):
+        """Make the local plan final for every refinement that has not stored its plan."""
+        with self._lock:
+            unfinished, self._unfinished = self._unfinished, {}
+        for plan_id, (request, _) in unfinished.items():
+            try:
+                self.keep_local(plan_id, *request)
+            except Exception as e:
+                pass
+
+    def refine(self, plan_id, subject, hours_per_day, scenario, days):
+        """Ask the model for the plan and store whichever plan is final. Returns True if it was upgraded."""
+        from services.ai_service import request_study_plan
+
+        if self.tasks.closed:
+            return False
+        try:
+            plan = request_study_plan(subject, hours_per_day, scenario, days)
+        except Exception as e:
+            record_fallback("study_plan", "error")
+            if self._finish(plan_id):
+                self.keep_local(plan_id, subject, hours_per_day, scenario, days)
+            return False
+        if not self._finish(plan_id):
+            return False
+        self.store.put('plan', plan, plan_id)
+        return True
+
+
+plan_refiner = PlanRefiner(artifact_store, plan_tasks)
@@ -0,0 +1,249 @@
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import sqlite3
+import threading
+
+from services.cache_service import normalize_subject, normalize_text
+from services.subject_index import resolve_subject
+from services.task_queue import refill_tasks
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+BANK_PATH = os.environ.get("QUESTION_BANK_PATH", os.path.join(DATA_DIR, 'question_bank.sqlite3'))
+LOW_WATERMARK = int(os.environ.get("QUESTION_BANK_LOW_WATERMARK", "20"))
+HIGH_WATERMARK = int(os.environ.get("QUESTION_BANK_HIGH_WATERMARK", "60"))
+REFILL_BATCH_SIZE = int(os.environ.get("QUESTION_BANK_REFILL_BATCH_SIZE", "10"))
+REFILL_MIN_REQUESTS = int(os.environ.get("QUESTION_BANK_REFILL_MIN_REQUESTS", "3"))
+REFILL_LEASE_SECONDS = 300
+
+LETTERS = "ABCD"
+OPTION_PREFIX = re.compile(r"^\s*\(?([A-Da-d])[\).:]\s*")
+
+
+def bucket_key(subject, difficulty):
+    """Return the normalized (subject, difficulty) bucket for a quiz request."""
+    return normalize_subject(subject), normalize_text(difficulty)
+
+
+def question_hash(text):
+    """Hash question text with case, punctuation and whitespace normalized away."""
+    normalized = " ".join(re.sub(r"[^\w\s]", " ", str(text).lower()).split())
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def validate_question(question):
+    """Return a cleaned copy of a generated question, or None if it is unusable."""
+    if not isinstance(question, dict):
+        return None
+    text = question.get("question")
+    options = question.get("options")
+    answer = str(question.get("correct_answer", "")).strip().upper()[:1]
+    if not isinstance(text, str) or not text.strip():
+        return None
+    if not isinstance(options, list) or len(options) != len(LETTERS):
+        return None
+    if not all(isinstance(option, str) and option.strip() for option in options):
+        return None
+    if answer not in LETTERS:
+        return None
+
+    cleaned_options = []
+    for letter, option in zip(LETTERS, options):
+        body = OPTION_PREFIX.sub("", option.strip(), count=1)
+        cleaned_options.append(f"{letter}) {body}")
+
+    return {
+        "question": text.strip(),
+        "options": cleaned_options,
+        "correct_answer": answer,
+        "explanation": str(question.get("explanation", "")).strip()
+    }
+
+
+class QuestionBank:
+    """SQLite store of validated quiz questions, bucketed by subject and difficulty."""
+
+    def __init__(self, path=BANK_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS questions (
+                    id INTEGER PRIMARY KEY,
+                    subject TEXT NOT NULL,
+                    difficulty TEXT NOT NULL,
+                    question_hash TEXT NOT NULL,
+                    question TEXT NOT NULL,
+                    options TEXT NOT NULL,
+                    correct_answer TEXT NOT NULL,
+                    explanation TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    UNIQUE (subject, difficulty, question_hash)
+                );
+                CREATE TABLE IF NOT EXISTS demand (
+                    subject TEXT NOT NULL,
+                    difficulty TEXT NOT NULL,
+                    requests INTEGER NOT NULL,
+                    PRIMARY KEY (subject, difficulty)
+                );
+                CREATE TABLE IF NOT EXISTS refills (
+                    subject TEXT NOT NULL,
+                    difficulty TEXT NOT NULL,
+                    started_at REAL NOT NULL,
+                    PRIMARY KEY (subject, difficulty)
+                );
+            """)
+            self._local.conn = conn
+        return conn
+
+    def add_questions(self, subject, difficulty, questions):
+        """Validate and store questions, skipping duplicates. Returns the number added."""
+        subject, difficulty = bucket_key(subject, difficulty)
+        rows = []
+        for question in questions or []:
+            question = validate_question(question)
+            if question is not None:
+                rows.append((
+                    subject, difficulty, question_hash(question["question"]), question["question"],
+                    json.dumps(question["options"]), question["correct_answer"],
+                    question["explanation"], time.time()
+                ))
+
+        conn = self._connect()
+        with conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO questions (subject, difficulty, question_hash, question, "
+                "options, correct_answer, explanation, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            return conn.total_changes - before
+
+    def count(self, subject, difficulty):
+        subject, difficulty = bucket_key(subject, difficulty)
+        return self._connect().execute(
+            "SELECT COUNT(*) FROM questions WHERE subject = ? AND difficulty = ?", (subject, difficulty)
+        ).fetchone()[0]
+
+    def sample(self, subject, difficulty, num_questions):
+        """Return up to ``num_questions`` random questions from a bucket."""
+        subject, difficulty = bucket_key(subject, difficulty)
+        conn = self._connect()
+        ids = [row[0] for row in conn.execute(
+            "SELECT id FROM questions WHERE subject = ? AND difficulty = ?", (subject, difficulty)
+        )]
+        chosen = random.sample(ids, min(num_questions, len(ids)))
+        if not chosen:
+            return []
+
+        placeholders = ",".join("?" * len(chosen))
+        rows = {row[0]: row[1:] for row in conn.execute(
+            f"SELECT id, question, options, correct_answer, explanation FROM questions "
+            f"WHERE id IN ({placeholders})", chosen
+        )}
+        return [
+            {
+                "question": rows[question_id][0],
+                "options": json.loads(rows[question_id][1]),
+                "correct_answer": rows[question_id][2],
+                "explanation": rows[question_id][3]
+            }
+            for question_id in chosen if question_id in rows
+        ]
+
+    def record_request(self, subject, difficulty):
+        """Count a quiz request for a bucket. Returns the bucket's request count so far."""
+        subject, difficulty = bucket_key(subject, difficulty)
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT INTO demand (subject, difficulty, requests) VALUES (?, ?, 1) "
+                "ON CONFLICT (subject, difficulty) DO UPDATE SET requests = requests + 1",
+                (subject, difficulty)
+            )
+            return conn.execute(
+                "SELECT requests FROM demand WHERE subject = ? AND difficulty = ?", (subject, difficulty)
+            ).fetchone()[0]
+
+    def claim_refill(self, subject, difficulty):
+        """Take a cross-process lease on refilling a bucket. Returns False if another worker holds it."""
+        subject, difficulty = bucket_key(subject, difficulty)
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO refills (subject, difficulty, started_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (subject, difficulty) DO UPDATE SET started_at = excluded.started_at "
+                "WHERE refills.started_at < ?",
+                (subject, difficulty, now, now - REFILL_LEASE_SECONDS)
+            )
+            return cursor.rowcount > 0
+
+    def release_refill(self, subject, difficulty):
+        subject, difficulty = bucket_key(subject, difficulty)
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM refills WHERE subject = ? AND difficulty = ?", (subject, difficulty))
+
+
+question_bank = QuestionBank()
+
+
+def assemble_quiz(subject, difficulty, questions):
+    """Number questions and wrap them in the quiz structure the templates expect."""
+    return {
+        "quiz_title": f"Quiz: {subject}",
+        "difficulty": difficulty,
+        "questions": [dict(question, id=i + 1) for i, question in enumerate(questions)]
+    }
+
+
+def request_refill(subject, difficulty):
+    """Count a quiz request and queue a refill if the bucket has demand and is below the low watermark.
+
+    Catalog subjects always have demand; free-form subjects need
+    ``REFILL_MIN_REQUESTS`` quiz requests first, so a one-off subject
+    costs no more than its own quiz.
+    """
+    key = bucket_key(subject, difficulty)
+    requests = question_bank.record_request(*key)
+    if requests < REFILL_MIN_REQUESTS and resolve_subject(subject) is None:
+        return
+    if question_bank.count(*key) >= LOW_WATERMARK:
+        return
+    refill_tasks.offer_once(("question_bank",) + key, refill, subject, difficulty)
+
+
+def refill(subject, difficulty):
+    """Generate questions until the bucket reaches the high watermark. Returns the number added.
+
+    Stops between batches once the refill queue is shutting down.
+    """
+    from services.ai_service import generate_question_batch
+    from services.llm_client import is_available
+
+    if not is_available() or not question_bank.claim_refill(subject, difficulty):
+        return 0
+    added = 0
+    try:
+        while not refill_tasks.closed:
+            missing = HIGH_WATERMARK - question_bank.count(subject, difficulty)
+            if missing <= 0:
+                break
+            questions = generate_question_batch(subject, difficulty, min(REFILL_BATCH_SIZE, missing))
+            new = question_bank.add_questions(subject, difficulty, questions)
+            added += new
+            if new == 0:
+                break
+    finally:
+        question_bank.release_refill(subject, difficulty)
+    return added
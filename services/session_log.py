@@ -0,0 +1,89 @@
+import os
+import csv
+import atexit
+import threading
+
+from services.file_lock import locked_file
+from services.metrics import stage
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+SESSIONS_FILE = os.path.join(DATA_DIR, 'user_sessions.csv')
+
+SESSION_FIELDS = ['subject', 'hours_per_day', 'scenario', 'feature_used', 'timestamp']
+
+FLUSH_SIZE = int(os.environ.get("SESSION_LOG_FLUSH_SIZE", "50"))
+FLUSH_INTERVAL = float(os.environ.get("SESSION_LOG_FLUSH_INTERVAL", "2"))
+
+
+class SessionWriter:
+    """Buffered, append-only CSV writer for session records.
+
+    Records are held in memory and appended to the log when the buffer
+    reaches ``flush_size`` records or every ``flush_interval`` seconds,
+    whichever comes first. Appends take an exclusive file lock so several
+    worker processes can share one log without losing rows.
+    """
+
+    def __init__(self, path=SESSIONS_FILE, flush_size=FLUSH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.flush_size = max(1, flush_size)
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+        self._pid = os.getpid()
+        self._listeners = []
+        atexit.register(self.flush)
+
+    def add_listener(self, callback):
+        """Call ``callback(start, end, records)`` after every append to the log."""
+        self._listeners.append(callback)
+
+    def write(self, record):
+        """Queue a record for appending."""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._buffer = []
+                self._timer = None
+                self._pid = os.getpid()
+            self._buffer.append({field: record.get(field, '') for field in SESSION_FIELDS})
+            should_flush = len(self._buffer) >= self.flush_size or self.flush_interval <= 0
+            if not should_flush and self._timer is None:
+                self._start_timer()
+
+        if should_flush:
+            self.flush()
+
+    def _start_timer(self):
+        self._timer = threading.Thread(target=self._run_timer, name="session-log-flush", daemon=True)
+        self._timer.start()
+
+    def _run_timer(self):
+        threading.Event().wait(self.flush_interval)
+        with self._lock:
+            self._timer = None
+        self.flush()
+
+    def flush(self):
+        """Append all buffered records to the log."""
+        with self._flush_lock:
+            with self._lock:
+                records, self._buffer = self._buffer, []
+            if not records:
+                return 0
+
+            with stage("csv.append"), locked_file(self.path, 'a', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=SESSION_FIELDS)
+                start = f.seek(0, os.SEEK_END)
+                if start == 0:
+                    writer.writeheader()
+                writer.writerows(records)
+                f.flush()
+                end = f.tell()
+                for callback in self._listeners:
+                    callback(start, end, records)
+            return len(records)
+
+
+session_writer = SessionWriter()
@@ -0,0 +1,186 @@
+import os
+import io
+import csv
+import json
+import time
+import atexit
+import threading
+
+from services.file_lock import locked_file
+from services.session_log import SESSIONS_FILE, SESSION_FIELDS, session_writer
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+SNAPSHOT_FILE = os.path.join(DATA_DIR, 'session_stats.json')
+SNAPSHOT_INTERVAL = float(os.environ.get("SESSION_STATS_SNAPSHOT_INTERVAL", "30"))
+
+
+class SessionStatistics:
+    """Running session counters kept in step with the append-only sessions log.
+
+    The aggregator remembers how many bytes of the log it has folded in.
+    Records written by this process are applied as they are appended, rows
+    appended by other workers are picked up by reading only the new tail of
+    the file, and the counters are persisted as a small JSON snapshot so a
+    restart does not need to rescan the log.
+    """
+
+    def __init__(self, log_path=SESSIONS_FILE, snapshot_path=SNAPSHOT_FILE,
+                 snapshot_interval=SNAPSHOT_INTERVAL):
+        self.log_path = log_path
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self._lock = threading.RLock()
+        self._last_snapshot = 0.0
+        self._dirty = False
+        self._reset()
+        self._load_snapshot()
+
+    def _reset(self):
+        self.offset = 0
+        self.inode = None
+        self.header = list(SESSION_FIELDS)
+        self.total_sessions = 0
+        self.subject_counts = {}
+        self.hours_sum = 0.0
+        self.hours_count = 0
+        self.version = 0
+
+    def _load_snapshot(self):
+        try:
+            with open(self.snapshot_path, 'r') as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.offset = snapshot.get("offset", 0)
+        self.inode = snapshot.get("inode")
+        self.header = snapshot.get("header", list(SESSION_FIELDS))
+        self.total_sessions = snapshot.get("total_sessions", 0)
+        self.subject_counts = snapshot.get("subject_counts", {})
+        self.hours_sum = snapshot.get("hours_sum", 0.0)
+        self.hours_count = snapshot.get("hours_count", 0)
+        self.version = snapshot.get("version", 0)
+
+    def save_snapshot(self):
+        """Persist the counters atomically."""
+        with self._lock:
+            snapshot = {
+                "offset": self.offset,
+                "inode": self.inode,
+                "header": self.header,
+                "total_sessions": self.total_sessions,
+                "subject_counts": self.subject_counts,
+                "hours_sum": self.hours_sum,
+                "hours_count": self.hours_count,
+                "version": self.version,
+            }
+            self._dirty = False
+            self._last_snapshot = time.monotonic()
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.snapshot_path)), exist_ok=True)
+        tmp_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, self.snapshot_path)
+
+    def _maybe_save_snapshot(self):
+        if self._dirty and time.monotonic() - self._last_snapshot >= self.snapshot_interval:
+            self.save_snapshot()
+
+    def _apply(self, row):
+        subject = row.get('subject', '')
+        if subject != '':
+            self.subject_counts[subject] = self.subject_counts.get(subject, 0) + 1
+        try:
+            self.hours_sum += float(row.get('hours_per_day', ''))
+            self.hours_count += 1
+        except (TypeError, ValueError):
+            pass
+        self.total_sessions += 1
+
+    def on_append(self, start, end, records):
+        """Fold in records this process just appended to the log."""
+        with self._lock:
+            if start != self.offset:
+                return
+            for record in records:
+                self._apply({k: str(v) for k, v in record.items()})
+            self.offset = end
+            self.version += 1
+            self._dirty = True
+            self._maybe_save_snapshot()
+
+    def refresh(self):
+        """Fold in any rows appended to the log since the last refresh."""
+        try:
+            st = os.stat(self.log_path)
+        except FileNotFoundError:
+            if self.offset:
+                self.rebuild()
+            return
+
+        with self._lock:
+            if (self.inode is not None and st.st_ino != self.inode) or st.st_size < self.offset:
+                self._reset()
+            self.inode = st.st_ino
+            offset = self.offset
+            if st.st_size == offset:
+                return
+
+        # The file lock is taken without holding self._lock: the writer calls
+        # on_append while it holds the file lock.
+        with locked_file(self.log_path, 'rb', shared=True) as f:
+            f.seek(offset)
+            data = f.read()
+
+        complete = data[:data.rfind(b'\n') + 1]
+        if not complete:
+            return
+        reader = csv.reader(io.StringIO(complete.decode('utf-8'), newline=''))
+
+        with self._lock:
+            if self.offset != offset:
+                return
+            if offset == 0:
+                self.header = next(reader, list(SESSION_FIELDS))
+            for values in reader:
+                if values:
+                    self._apply(dict(zip(self.header, values)))
+            self.offset += len(complete)
+            self.version += 1
+            self._dirty = True
+            self._maybe_save_snapshot()
+
+    def rebuild(self):
+        """Recompute every counter from the raw log, including records still buffered."""
+        session_writer.flush()
+        with self._lock:
+            self._reset()
+            self._dirty = True
+        self.refresh()
+        self.save_snapshot()
+
+    def get_statistics(self):
+        """Return the session statistics in the shape the templates expect.
+
+        Buffered records are not flushed here, so the counts may lag the
+        log's flush interval.
+        """
+        self.refresh()
+        with self._lock:
+            subjects = dict(sorted(self.subject_counts.items(), key=lambda item: item[1], reverse=True))
+            return {
+                "total_sessions": self.total_sessions,
+                "subjects_studied": subjects,
+                "avg_study_hours": self.hours_sum / self.hours_count if self.hours_count else 0
+            }
+
+    def close(self):
+        """Flush pending records and persist the snapshot on shutdown."""
+        session_writer.flush()
+        if self._dirty:
+            self.save_snapshot()
+
+
+session_statistics = SessionStatistics()
+session_writer.add_listener(session_statistics.on_append)
+atexit.register(session_statistics.close)
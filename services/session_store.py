@@ -0,0 +1,201 @@
+import os
+import csv
+import io
+import sqlite3
+import threading
+from datetime import datetime
+
+from services.cache_service import normalize_subject
+from services.file_lock import locked_file
+from services.session_log import SESSIONS_FILE, session_writer
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+SESSION_DB_PATH = os.environ.get("SESSION_DB_PATH", os.path.join(DATA_DIR, 'sessions.sqlite3'))
+
+GROUPINGS = {
+    "subject": "subject_key",
+    "feature": "feature_used",
+    "day": "substr(timestamp, 1, 10)",
+    "hour": "substr(timestamp, 1, 13) || ':00'",
+}
+MAX_GROUPS = 1000
+
+
+def parse_time(value):
+    """Parse an ISO date or datetime into the sortable form timestamps are stored in, or None."""
+    if not value:
+        return None
+    return datetime.fromisoformat(value).isoformat()
+
+
+def _hours(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class SessionStore:
+    """Indexed SQLite copy of the session log for time-windowed analytics.
+
+    The store is fed by the session writer: every batch appended to the
+    CSV log is inserted here while the writer still holds the log's file
+    lock, so the two stay in step across worker processes. Rows logged
+    before the store existed are imported once, on first use.
+    """
+
+    def __init__(self, path=SESSION_DB_PATH, log_path=SESSIONS_FILE):
+        self.path = path
+        self.log_path = log_path
+        self._local = threading.local()
+        self._migrated = False
+        self.errors = 0
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    id INTEGER PRIMARY KEY,
+                    timestamp TEXT NOT NULL,
+                    subject TEXT NOT NULL,
+                    subject_key TEXT NOT NULL,
+                    hours_per_day REAL,
+                    scenario TEXT NOT NULL,
+                    feature_used TEXT NOT NULL
+                );
+                -- Covering indexes: analytics queries never have to visit the table rows.
+                CREATE INDEX IF NOT EXISTS idx_sessions_timestamp
+                    ON sessions (timestamp, subject_key, feature_used, hours_per_day);
+                CREATE INDEX IF NOT EXISTS idx_sessions_subject
+                    ON sessions (subject_key, timestamp, feature_used, hours_per_day);
+                CREATE INDEX IF NOT EXISTS idx_sessions_feature
+                    ON sessions (feature_used, timestamp, subject_key, hours_per_day);
+                CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            """)
+            self._local.conn = conn
+        return conn
+
+    def _insert(self, conn, records):
+        conn.executemany(
+            "INSERT INTO sessions (timestamp, subject, subject_key, hours_per_day, scenario, feature_used) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    str(record.get('timestamp') or ''), str(record.get('subject') or ''),
+                    normalize_subject(record.get('subject') or ''), _hours(record.get('hours_per_day')),
+                    str(record.get('scenario') or ''), str(record.get('feature_used') or '')
+                )
+                for record in records
+            )
+        )
+
+    def _import_log(self, conn, upto=None):
+        """Import log rows up to byte offset ``upto`` unless that was already done. Caller holds the log lock."""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'csv_imported'").fetchone() is None:
+                imported = 0
+                if os.path.exists(self.log_path):
+                    with open(self.log_path, 'rb') as f:
+                        data = f.read() if upto is None else f.read(upto)
+                    reader = csv.DictReader(io.StringIO(data.decode('utf-8'), newline=''))
+                    batch = []
+                    for row in reader:
+                        batch.append(row)
+                        if len(batch) >= 10000:
+                            self._insert(conn, batch)
+                            imported += len(batch)
+                            batch = []
+                    self._insert(conn, batch)
+                    imported += len(batch)
+                conn.execute("INSERT INTO meta (key, value) VALUES ('csv_imported', ?)", (str(imported),))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._migrated = True
+
+    def migrate(self):
+        """Import the existing CSV log once. Safe to call from any worker at any time."""
+        if self._migrated:
+            return
+        conn = self._connect()
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'csv_imported'").fetchone() is not None:
+            self._migrated = True
+            return
+        if not os.path.exists(self.log_path):
+            self._import_log(conn)
+            return
+        # Lock order is always log file, then database, the same as on_append.
+        with locked_file(self.log_path, 'rb', shared=True):
+            self._import_log(conn)
+
+    def on_append(self, start, end, records):
+        """Session writer listener: insert records just appended to the log."""
+        try:
+            conn = self._connect()
+            if not self._migrated:
+                # The writer already holds the log lock; import what preceded this batch.
+                self._import_log(conn, upto=start)
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._insert(conn, records)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error:
+            self.errors += 1
+
+    def query(self, start=None, end=None, group_by="subject", subject=None, feature=None):
+        """Count sessions in ``[start, end)`` grouped by subject, feature, day or hour."""
+        if group_by not in GROUPINGS:
+            raise ValueError(f"group_by must be one of {', '.join(GROUPINGS)}")
+        self.migrate()
+
+        clauses, params = [], []
+        if start:
+            clauses.append("timestamp >= ?")
+            params.append(start)
+        if end:
+            clauses.append("timestamp < ?")
+            params.append(end)
+        if subject:
+            clauses.append("subject_key = ?")
+            params.append(normalize_subject(subject))
+        if feature:
+            clauses.append("feature_used = ?")
+            params.append(feature)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        column = GROUPINGS[group_by]
+
+        order = "grp" if group_by in ("day", "hour") else "COUNT(*) DESC, grp"
+
+        conn = self._connect()
+        rows = conn.execute(
+            f"SELECT {column} AS grp, COUNT(*), AVG(hours_per_day) FROM sessions {where} "
+            f"GROUP BY grp ORDER BY {order} LIMIT {MAX_GROUPS + 1}",
+            params
+        ).fetchall()
+        total = conn.execute(f"SELECT COUNT(*) FROM sessions {where}", params).fetchone()[0]
+        groups = [
+            {"key": key, "count": count, "avg_hours": round(avg, 2) if avg is not None else None}
+            for key, count, avg in rows[:MAX_GROUPS]
+        ]
+        return {
+            "group_by": group_by,
+            "start": start,
+            "end": end,
+            "total": total,
+            "groups": groups,
+            "truncated": len(rows) > MAX_GROUPS
+        }
+
+
+session_store = SessionStore()
+session_writer.add_listener(session_store.on_append)
@@ -0,0 +1,152 @@
+import os
+import copy
+import time
+import hashlib
+import threading
+
+from services.file_lock import try_lock, unlock
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+SINGLE_FLIGHT_ENABLED = os.environ.get("SINGLE_FLIGHT_ENABLED", "1") not in ("0", "false", "no")
+SINGLE_FLIGHT_LOCK_DIR = os.environ.get(
+    "SINGLE_FLIGHT_LOCK_DIR", os.path.join(DATA_DIR, 'cache', 'inflight')
+)
+SINGLE_FLIGHT_WAIT_SECONDS = float(os.environ.get("SINGLE_FLIGHT_WAIT_SECONDS", "45"))
+POLL_INTERVAL = 0.05
+
+
+class _Call:
+    """One in-flight call and the callers waiting on it."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one execution.
+
+    Within a process, the first caller for a key runs the function and
+    later callers block until it finishes and receive a copy of its
+    result. Across processes, the leader also takes a lock file named
+    after the key, so unrelated keys never wait on each other; a process
+    that finds the file locked waits for it and then tries ``lookup``
+    (typically the shared response cache) before running the function
+    itself. The holder removes the lock file when it is done, unless the
+    path already names a newer leader's file. A process that opened it
+    just before may then run alongside a later leader, which at worst
+    repeats an upstream call.
+    """
+
+    def __init__(self, lock_dir=SINGLE_FLIGHT_LOCK_DIR, wait_seconds=SINGLE_FLIGHT_WAIT_SECONDS,
+                 enabled=SINGLE_FLIGHT_ENABLED):
+        self.lock_dir = lock_dir
+        self.wait_seconds = wait_seconds
+        self.enabled = enabled
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._counters = {
+            "executions": 0, "coalesced": 0, "coalesced_cross_process": 0, "wait_timeouts": 0
+        }
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def do(self, key, fn, lookup=None):
+        """Return ``fn()``, sharing one execution among concurrent callers with the same key."""
+        if not self.enabled:
+            return fn()
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            if not call.done.wait(self.wait_seconds):
+                self._count("wait_timeouts")
+                return fn()
+            self._count("coalesced")
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            call.result = self._run_exclusive(key, fn, lookup)
+            return copy.deepcopy(call.result)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _lock_path(self, key):
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.lock_dir, f"{digest}.lock")
+
+    def _run_exclusive(self, key, fn, lookup):
+        """Run fn while holding the key's cross-process lock file."""
+        path = self._lock_path(key)
+        try:
+            os.makedirs(self.lock_dir, exist_ok=True)
+            f = open(path, 'a')
+        except OSError:
+            self._count("executions")
+            return fn()
+
+        try:
+            contended = not try_lock(f)
+            if contended:
+                deadline = time.monotonic() + self.wait_seconds
+                while not try_lock(f):
+                    if time.monotonic() >= deadline:
+                        self._count("wait_timeouts")
+                        self._count("executions")
+                        return fn()
+                    time.sleep(POLL_INTERVAL)
+
+            try:
+                if contended and lookup is not None:
+                    result = lookup()
+                    if result is not None:
+                        self._count("coalesced_cross_process")
+                        return result
+                self._count("executions")
+                return fn()
+            finally:
+                # A waiter's file may already be unlinked, and ``path`` may
+                # now name a newer leader's file; only remove our own.
+                try:
+                    if os.fstat(f.fileno()).st_ino == os.stat(path).st_ino:
+                        os.remove(path)
+                except OSError:
+                    pass  # Already removed, or still open elsewhere on Windows.
+                unlock(f)
+        finally:
+            f.close()
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self):
+        """Return how many calls ran upstream and how many were coalesced."""
+        with self._lock:
+            stats = dict(self._counters)
+        stats["in_flight"] = self.in_flight()
+        stats["enabled"] = self.enabled
+        return stats
+
+
+single_flight = SingleFlight()
+
+
+def get_single_flight_stats():
+    """Get execution and coalescing counters for in-flight request deduplication."""
+    return single_flight.stats()
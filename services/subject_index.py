@@ -0,0 +1,192 @@
+import os
+import re
+import math
+import threading
+from collections import defaultdict, OrderedDict
+
+from services.cache_service import SUBJECT_ALIASES
+from services.content_repository import content_repository, normalize_subject_key
+from services.nlp_service import FALLBACK_STOPWORDS
+
+MIN_SCORE = float(os.environ.get("SUBJECT_MATCH_MIN_SCORE", "0.5"))
+RESOLVE_CACHE_SIZE = 2048
+
+# Weight of a match by the field it came from: a hit on the subject name
+# beats a hit on one of its topics, which beats a word from its sample text.
+FIELD_WEIGHTS = {"name": 1.0, "alias": 1.0, "topic": 0.9, "content": 0.6}
+
+FILLER_WORDS = frozenset({
+    "intro", "introduction", "to", "of", "the", "and", "in", "for", "a", "an",
+    "basic", "basics", "beginner", "beginners", "advanced", "intermediate",
+    "fundamentals", "principles", "course", "class", "101", "ap", "honors",
+    "i", "ii", "iii", "1", "2", "3"
+})
+
+WORD = re.compile(r"[a-z0-9]+")
+
+
+def _words(text):
+    return WORD.findall(str(text).lower().replace("_", " "))
+
+
+def _clean(text):
+    """Lowercase, drop punctuation and filler words like "intro to"."""
+    words = _words(text)
+    kept = [word for word in words if word not in FILLER_WORDS]
+    return " ".join(kept or words)
+
+
+def trigrams(text):
+    """Return the padded character trigrams of each word in text."""
+    grams = []
+    for word in text.split():
+        padded = f"  {word} "
+        grams.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class SubjectIndex:
+    """Character-trigram TF-IDF index over subject names, aliases, topics and content.
+
+    Every label (a subject name, alias, topic or salient content word) is
+    a trigram vector. Lookups only touch the posting lists of the query's
+    trigrams, so resolution cost does not grow with the number of subjects.
+    """
+
+    def __init__(self, labels):
+        self.subject_of = []
+        self.field_weight = []
+        self.exact = {}
+        postings = defaultdict(list)
+        label_grams = []
+
+        for label, subject_key, field in labels:
+            cleaned = _clean(label)
+            if not cleaned:
+                continue
+            label_id = len(self.subject_of)
+            self.subject_of.append(subject_key)
+            self.field_weight.append(FIELD_WEIGHTS[field])
+            if field in ("name", "alias", "topic"):
+                self.exact.setdefault(cleaned, subject_key)
+            counts = defaultdict(int)
+            for gram in trigrams(cleaned):
+                counts[gram] += 1
+            label_grams.append(counts)
+            for gram in counts:
+                postings[gram].append(label_id)
+
+        n_labels = max(len(label_grams), 1)
+        self.idf = {gram: math.log((1 + n_labels) / (1 + len(ids))) + 1 for gram, ids in postings.items()}
+        self.max_idf = max(self.idf.values(), default=1.0)
+        self.postings = {}
+        self.norms = []
+        for label_id, counts in enumerate(label_grams):
+            weights = {gram: count * self.idf[gram] for gram, count in counts.items()}
+            self.norms.append(math.sqrt(sum(w * w for w in weights.values())))
+            for gram, weight in weights.items():
+                self.postings.setdefault(gram, []).append((label_id, weight))
+
+    def match(self, query):
+        """Return ``(subject_key, score)`` for the best match, or ``(None, 0.0)``."""
+        cleaned = _clean(query)
+        if not cleaned:
+            return None, 0.0
+        if cleaned in self.exact:
+            return self.exact[cleaned], 1.0
+
+        counts = defaultdict(int)
+        for gram in trigrams(cleaned):
+            counts[gram] += 1
+        query_weights = {gram: count * self.idf[gram] for gram, count in counts.items() if gram in self.idf}
+        if not query_weights:
+            return None, 0.0
+        # Trigrams unknown to the index still count towards the query norm.
+        unknown = sum(count for gram, count in counts.items() if gram not in self.idf)
+        query_norm = math.sqrt(sum(w * w for w in query_weights.values()) + (unknown * self.max_idf) ** 2)
+
+        dots = defaultdict(float)
+        for gram, query_weight in query_weights.items():
+            for label_id, weight in self.postings[gram]:
+                dots[label_id] += query_weight * weight
+
+        best_subject, best_score = None, 0.0
+        for label_id, dot in dots.items():
+            score = dot / (query_norm * self.norms[label_id]) * self.field_weight[label_id]
+            if score > best_score:
+                best_subject, best_score = self.subject_of[label_id], score
+        return best_subject, best_score
+
+
+def _catalog_labels(index, subjects_dir):
+    """Yield ``(label, subject_key, field)`` for everything a subject can be called."""
+    topic_owner = {}
+    for key, entry in index.subjects.items():
+        yield key, key, "name"
+        for alias in entry.get("aliases", []):
+            yield alias, key, "alias"
+        for topic in entry.get("topics", []):
+            topic_owner.setdefault(topic.lower(), key)
+            yield topic, key, "topic"
+        content_words = {
+            word for word in _words(entry.get("sample_content", ""))
+            if len(word) > 4 and word not in FALLBACK_STOPWORDS
+        }
+        for word in sorted(content_words):
+            yield word, key, "content"
+
+    if subjects_dir and os.path.isdir(subjects_dir):
+        for file_name in os.listdir(subjects_dir):
+            key = file_name[:-5]
+            if file_name.endswith(".json") and key not in index.subjects:
+                yield key, key, "name"
+
+    # Built-in aliases may point at a subject or at a topic ("calc" -> "calculus").
+    for alias, canonical in SUBJECT_ALIASES.items():
+        key = normalize_subject_key(canonical)
+        owner = key if key in index.subjects else topic_owner.get(canonical)
+        if owner:
+            yield alias, owner, "alias"
+
+
+_index = None
+_index_signature = object()
+_index_lock = threading.Lock()
+_resolved = OrderedDict()
+_resolved_lock = threading.Lock()
+
+
+def get_subject_index():
+    """Return the subject index, rebuilding it when the content catalog changes."""
+    global _index, _index_signature
+    content_index = content_repository.index()
+    if _index is not None and _index_signature is content_index:
+        return _index
+
+    with _index_lock:
+        if _index is None or _index_signature is not content_index:
+            _index = SubjectIndex(list(_catalog_labels(content_index, content_repository.subjects_dir)))
+            _index_signature = content_index
+            with _resolved_lock:
+                _resolved.clear()
+        return _index
+
+
+def resolve_subject(subject):
+    """Return the catalog key that best matches a free-form subject name, or None."""
+    index = get_subject_index()
+    query = " ".join(str(subject).lower().split())
+
+    with _resolved_lock:
+        if query in _resolved:
+            _resolved.move_to_end(query)
+            return _resolved[query]
+
+    key, score = index.match(query)
+    resolved = key if score >= MIN_SCORE else None
+
+    with _resolved_lock:
+        _resolved[query] = resolved
+        if len(_resolved) > RESOLVE_CACHE_SIZE:
+            _resolved.popitem(last=False)
+    return resolved
@@ -0,0 +1,241 @@
+import os
+import time
+import queue
+import atexit
+import threading
+
+TASK_QUEUE_WORKERS = int(os.environ.get("TASK_QUEUE_WORKERS", "2"))
+TASK_QUEUE_MAX_SIZE = int(os.environ.get("TASK_QUEUE_MAX_SIZE", "1000"))
+TASK_QUEUE_DRAIN_SECONDS = float(os.environ.get("TASK_QUEUE_DRAIN_SECONDS", "10"))
+REFILL_QUEUE_WORKERS = int(os.environ.get("REFILL_QUEUE_WORKERS", "2"))
+REFILL_QUEUE_MAX_SIZE = int(os.environ.get("REFILL_QUEUE_MAX_SIZE", "100"))
+PLAN_QUEUE_WORKERS = int(os.environ.get("PLAN_QUEUE_WORKERS", "4"))
+PLAN_QUEUE_MAX_SIZE = int(os.environ.get("PLAN_QUEUE_MAX_SIZE", "100"))
+
+_STOP = object()
+
+
+class TaskQueue:
+    """Bounded in-process queue that runs side work on background threads.
+
+    Tasks are best for bookkeeping that should not delay a response. When
+    the queue is full, or after shutdown has started, ``submit`` runs the
+    task in the caller's thread instead of dropping it. On shutdown, tasks
+    still queued get ``drain_seconds`` to finish; anything left after that
+    is dropped. Worker threads start on first use in each process.
+    """
+
+    def __init__(self, workers=TASK_QUEUE_WORKERS, max_size=TASK_QUEUE_MAX_SIZE,
+                 drain_seconds=TASK_QUEUE_DRAIN_SECONDS):
+        self.workers = max(1, workers)
+        self.max_size = max(1, max_size)
+        self.drain_seconds = drain_seconds
+        self._queue = None
+        self._threads = []
+        self._pid = None
+        self._closed = False
+        self._lock = threading.Lock()
+        self._drain_hooks = []
+        self._keys = set()
+        self._counters = {
+            "submitted": 0, "completed": 0, "failed": 0, "ran_inline": 0, "declined": 0,
+            "dropped": 0, "max_depth": 0, "total_wait_seconds": 0.0
+        }
+
+    @property
+    def closed(self):
+        """True once shutdown has started; long tasks can check it to stop early."""
+        return self._closed
+
+    def on_drain(self, callback):
+        """Call ``callback()`` after the queue has been drained on shutdown."""
+        self._drain_hooks.append(callback)
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        self._queue = queue.Queue(maxsize=self.max_size)
+        self._threads = []
+        self._keys = set()
+        self._pid = os.getpid()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"task-queue-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _enqueue(self, fn, args, kwargs):
+        # Called with self._lock held.
+        if self._closed:
+            return False
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((time.monotonic(), fn, args, kwargs))
+        except queue.Full:
+            return False
+        self._counters["submitted"] += 1
+        self._counters["max_depth"] = max(self._counters["max_depth"], self._queue.qsize())
+        return True
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue ``fn(*args, **kwargs)``. Returns False if it had to run inline."""
+        with self._lock:
+            if self._enqueue(fn, args, kwargs):
+                return True
+            self._counters["ran_inline"] += 1
+
+        self._execute(fn, args, kwargs)
+        return False
+
+    def offer(self, fn, *args, **kwargs):
+        """Queue ``fn(*args, **kwargs)`` if there is room. Returns False, without running it, otherwise.
+
+        For tasks too slow to run in the caller's thread; the caller decides
+        what to do instead.
+        """
+        with self._lock:
+            if self._enqueue(fn, args, kwargs):
+                return True
+            self._counters["declined"] += 1
+        return False
+
+    def offer_once(self, key, fn, *args, **kwargs):
+        """Like ``offer``, but does nothing while a task offered under ``key`` is queued or running.
+
+        Returns False only if the task was declined.
+        """
+        def run():
+            try:
+                fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._keys.discard(key)
+
+        with self._lock:
+            if not self._closed:
+                self._ensure_started()
+                if key in self._keys:
+                    return True
+                if self._enqueue(run, (), {}):
+                    self._keys.add(key)
+                    return True
+            self._counters["declined"] += 1
+        return False
+
+    def join(self):
+        """Block until every task queued in this process has finished."""
+        with self._lock:
+            task_queue = self._queue if self._pid == os.getpid() else None
+        if task_queue is not None:
+            task_queue.join()
+
+    def _execute(self, fn, args, kwargs):
+        try:
+            fn(*args, **kwargs)
+        except Exception as e:
+            with self._lock:
+                self._counters["failed"] += 1
+            return False
+        return True
+
+    def _run(self):
+        task_queue = self._queue
+        while True:
+            item = task_queue.get()
+            try:
+                if item is _STOP:
+                    return
+                enqueued_at, fn, args, kwargs = item
+                waited = time.monotonic() - enqueued_at
+                if self._execute(fn, args, kwargs):
+                    with self._lock:
+                        self._counters["completed"] += 1
+                with self._lock:
+                    self._counters["total_wait_seconds"] += waited
+            finally:
+                task_queue.task_done()
+
+    def shutdown(self, timeout=None):
+        """Stop accepting tasks, run what is queued until the deadline, then call the drain hooks.
+
+        Tasks the workers have not started by the deadline run in this
+        thread while time remains and are dropped after that.
+        """
+        timeout = self.drain_seconds if timeout is None else timeout
+        with self._lock:
+            self._closed = True
+            running = self._pid == os.getpid()
+            threads = self._threads if running else []
+            task_queue = self._queue
+
+        if threads:
+            deadline = time.monotonic() + timeout
+            for _ in threads:
+                try:
+                    task_queue.put(_STOP, timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Full:
+                    break
+            for thread in threads:
+                thread.join(max(0.0, deadline - time.monotonic()))
+            # Anything the workers did not reach runs here until the deadline.
+            while True:
+                try:
+                    item = task_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    pass
+                elif time.monotonic() >= deadline:
+                    with self._lock:
+                        self._counters["dropped"] += 1
+                elif self._execute(*item[1:]):
+                    with self._lock:
+                        self._counters["completed"] += 1
+                task_queue.task_done()
+
+        for callback in self._drain_hooks:
+            try:
+                callback()
+            except Exception as e:
+                pass
+
+    def stats(self):
+        """Return queue depth, throughput and backpressure counters."""
+        with self._lock:
+            stats = dict(self._counters)
+            depth = self._queue.qsize() if self._queue is not None and self._pid == os.getpid() else 0
+        finished = stats["completed"] + stats["failed"]
+        stats["depth"] = depth
+        stats["capacity"] = self.max_size
+        stats["workers"] = self.workers
+        stats["avg_wait_ms"] = round(stats.pop("total_wait_seconds") / finished * 1000, 2) if finished else 0
+        stats["closed"] = self._closed
+        return stats
+
+
+background_tasks = TaskQueue()
+atexit.register(background_tasks.shutdown)
+
+# Pool refills wait on OpenAI for many seconds, so they get their own
+# workers instead of holding up bookkeeping, and are dropped at exit.
+refill_tasks = TaskQueue(workers=REFILL_QUEUE_WORKERS, max_size=REFILL_QUEUE_MAX_SIZE, drain_seconds=0)
+atexit.register(refill_tasks.shutdown)
+
+# Plan refinements are slow for the same reason; the plan engine keeps
+# the local plan for any refinement dropped here.
+plan_tasks = TaskQueue(workers=PLAN_QUEUE_WORKERS, max_size=PLAN_QUEUE_MAX_SIZE, drain_seconds=0)
+atexit.register(plan_tasks.shutdown)
+
+
+def get_task_queue_stats():
+    """Get depth and backpressure counters for the background task queue."""
+    return background_tasks.stats()
+
+
+def get_refill_queue_stats():
+    """Get depth and backpressure counters for the pool refill queue."""
+    return refill_tasks.stats()
+
+
+def get_plan_queue_stats():
+    """Get depth and backpressure counters for the plan refinement queue."""
+    return plan_tasks.stats()